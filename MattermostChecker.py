@@ -2,10 +2,11 @@
 import os, sys, platform
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QIcon
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtNetwork import QLocalServer, QLocalSocket
 from main_window import MainWindow
 from ws_client import WSClient
+from config_loader import WS_CLIENT_MODE
 from notifications import init_qt_tray
 from signals_bus import signals
 
@@ -133,6 +134,8 @@ def main():
     # --- Main window (instance duy nhất) ---
     win = MainWindow()
     win.setWindowIcon(app_icon)
+    # ghi nốt log HTML còn trong hàng đợi trước khi thoát
+    app.aboutToQuit.connect(win.shutdown_log)
 
     def show_main_window():
         if win.isMinimized():
@@ -184,14 +187,49 @@ def main():
 
     # Kết nối tray/notification click -> bring-to-front
     signals.clicked.connect(show_main_window, type=Qt.ConnectionType.UniqueConnection)
-    signals.new_message.connect(lambda *args: flash_taskbar(win), type=Qt.ConnectionType.UniqueConnection)
+    # nháy taskbar 1 lần cho cả đợt message dồn dập (FlashWindowEx vẫn nháy tới khi cửa sổ được focus)
+    flash_gate = QTimer(win)
+    flash_gate.setSingleShot(True)
+    flash_gate.setInterval(1500)
 
-    # --- WebSocket client ---
-    wsclient = WSClient()
-    wsclient.start()
+    def _flash_debounced(*args):
+        if flash_gate.isActive():
+            return
+        flash_gate.start()
+        flash_taskbar(win)
+
+    signals.new_message.connect(_flash_debounced, type=Qt.ConnectionType.UniqueConnection)
 
-    win.show()
-    sys.exit(app.exec())
+    # --- WebSocket client ---
+    loop = _async_loop(app) if WS_CLIENT_MODE == "asyncio" else None
+    if loop is None:
+        wsclient = WSClient()
+        wsclient.start()
+        win.show()
+        sys.exit(app.exec())
+
+    from ws_client_async import AsyncWSClient
+    with loop:
+        wsclient = AsyncWSClient()
+        wsclient.start()
+        win.show()
+        loop.run_forever()
+        # app đã quit: huỷ kết nối + bản dịch đang chờ rồi mới đóng loop
+        loop.run_until_complete(wsclient.stop())
+    sys.exit(0)
+
+
+def _async_loop(app):
+    """Event loop asyncio chạy trên vòng lặp Qt (qasync); thiếu qasync / aiohttp → None (dùng WSClient thread)."""
+    try:
+        import asyncio
+        import qasync
+        import aiohttp  # noqa: F401  (AsyncWSClient cần)
+    except ImportError:
+        return None
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    return loop
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+# catchup.py
+"""
+Lấy bù các post bị lỡ trong lúc mất kết nối websocket (máy ngủ, rớt VPN) qua REST:
+GET /api/v4/channels/{id}/posts?since=<ms> cho mọi kênh theo dõi, song song.
+
+`since` trả về mọi post *được sửa* sau mốc đó, nên kết quả được lọc lại theo create_at
+(chỉ post mới hơn high-water mark của kênh, chưa bị xoá).
+
+fetch_missed_async: cùng việc đó bằng aiohttp cho AsyncWSClient.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def _headers(token: str, user_id: str = "") -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    if user_id:
+        headers["X-User-Id"] = user_id
+    return headers
+
+
+def _new_posts(body, since_ms):
+    posts = (body or {}).get("posts") or {}
+    return [
+        p for p in posts.values()
+        if int(p.get("create_at") or 0) > since_ms and not p.get("delete_at")
+    ]
+
+
+def _sorted(posts):
+    return sorted(posts, key=lambda p: (int(p.get("create_at") or 0), p.get("id") or ""))
+
+
+def _url(server_url, channel_id):
+    return f"{server_url.rstrip('/')}/api/v4/channels/{channel_id}/posts"
+
+
+def fetch_channel_since(server_url, channel_id, since_ms, headers, timeout=10.0, session=None):
+    """Post của 1 kênh tạo sau since_ms (chưa sắp xếp)."""
+    http = session or requests
+    resp = http.get(
+        _url(server_url, channel_id),
+        params={"since": int(since_ms)}, headers=headers, timeout=timeout, verify=False,
+    )
+    resp.raise_for_status()
+    return _new_posts(resp.json(), since_ms)
+
+
+def fetch_missed(server_url, token, marks, user_id="", timeout=10.0, workers=4, deadline=None):
+    """
+    marks: channel_id -> create_at (ms) của post mới nhất đã nhận.
+    Trả về (các post bị lỡ của mọi kênh, sắp theo create_at rồi id; các kênh lỗi).
+    Kênh lỗi: caller giữ mốc lấy bù của kênh đó và thử lại (xem WSClient._catch_up_result).
+    deadline: tổng số giây tối đa cho cả lần lấy bù; kênh chưa xong khi hết giờ tính là lỗi
+    (request đang treo không được chờ).
+    """
+    if not (server_url and token and marks):
+        return [], []
+    headers = _headers(token, user_id)
+    if deadline is not None:
+        timeout = min(timeout, deadline)
+        end = time.monotonic() + deadline
+    missed, failed = [], []
+    session = requests.Session()
+    pool = ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(marks))),
+                              thread_name_prefix="catchup")
+    futures = {
+        pool.submit(fetch_channel_since, server_url, ch, since, headers, timeout, session): ch
+        for ch, since in marks.items()
+    }
+    try:
+        for fut, ch in futures.items():
+            try:
+                left = None if deadline is None else max(0.0, end - time.monotonic())
+                missed.extend(fut.result(timeout=left))
+            except Exception:
+                failed.append(ch)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if all(fut.done() for fut in futures):
+        session.close()
+    return _sorted(missed), failed
+
+
+async def _fetch_channel_async(session, server_url, channel_id, since_ms, headers, timeout):
+    import aiohttp
+    async with session.get(_url(server_url, channel_id), params={"since": str(int(since_ms))},
+                           headers=headers, ssl=False,
+                           timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        resp.raise_for_status()
+        return _new_posts(await resp.json(content_type=None), since_ms)
+
+
+async def fetch_missed_async(session, server_url, token, marks, user_id="", timeout=10.0, deadline=None):
+    """Như fetch_missed nhưng chạy trên event loop (aiohttp.ClientSession), mọi kênh cùng lúc."""
+    if not (server_url and token and marks):
+        return [], []
+    headers = _headers(token, user_id)
+    if deadline is not None:
+        timeout = min(timeout, deadline)
+    tasks = {
+        asyncio.ensure_future(_fetch_channel_async(session, server_url, ch, since, headers, timeout)): ch
+        for ch, since in marks.items()
+    }
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    missed, failed = [], []
+    for task, ch in tasks.items():
+        if task in pending or task.exception() is not None:
+            failed.append(ch)
+        else:
+            missed.extend(task.result())
+    return _sorted(missed), failed
@@ -0,0 +1,91 @@
+# circuit_breaker.py
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker cho 1 provider dịch.
+      - closed   : gọi bình thường, đếm lỗi liên tiếp
+      - open     : bỏ qua provider ngay lập tức trong cooldown_sec
+      - half_open: hết cooldown → thử lại 1 lần (probe); OK → closed, lỗi → open lại
+    Nếu có probe_fn thì việc thử lại chạy ở background thread, message thật
+    không phải trả giá latency cho provider đang hỏng.
+    Probe raise một trong `inconclusive` (vd. hết quota phía client) → không kết luận được:
+    không tính là lỗi, thử probe lại sau retry_after giây (nếu có) thay vì chờ hết cooldown.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_sec: float = 60.0,
+                 probe_fn=None, inconclusive=()):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_sec = float(cooldown_sec)
+        self.probe_fn = probe_fn
+        self.inconclusive = tuple(inconclusive)
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.skipped = 0  # số lần provider bị bỏ qua vì mạch đang mở
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True nếu được phép gọi provider lúc này."""
+        start_probe = False
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and (time.monotonic() - self.opened_at) >= self.cooldown_sec:
+                self.state = self.HALF_OPEN
+                if self.probe_fn is None:
+                    # không có probe nền → chính request này làm probe
+                    return True
+                start_probe = True
+            self.skipped += 1
+        if start_probe:
+            threading.Thread(target=self._run_probe, name=f"probe-{self.name}", daemon=True).start()
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "skipped": self.skipped,
+            }
+
+    def _rearm(self, delay=None):
+        """Probe không kết luận được: mở lại mạch (không đếm lỗi), probe tiếp sau `delay` giây."""
+        wait = self.cooldown_sec if delay is None else min(self.cooldown_sec, max(0.0, float(delay)))
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() - self.cooldown_sec + wait
+
+    def _run_probe(self):
+        try:
+            ok = bool(self.probe_fn())
+        except self.inconclusive as e:
+            self._rearm(getattr(e, "retry_after", None))
+            return
+        except Exception:
+            ok = False
+        if ok:
+            self.record_success()
+        else:
+            self.record_failure()
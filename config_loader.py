@@ -70,4 +70,78 @@ API_KEY         = config.get("API_KEY", "")
 GEMINI_URL      = config.get("GEMINI_URL", "")
 HTML_LOG_FILE   = config.get("HTML_LOG", "messages.html")
 
+# ---- translation pipeline ----
+TRANSLATE_WORKERS    = int(config.get("TRANSLATE_WORKERS", 3))
+TRANSLATE_QUEUE_SIZE = int(config.get("TRANSLATE_QUEUE_SIZE", 200))
+# dịch sẵn mọi ngôn ngữ (vi/en/ja/id) cho mỗi message → đổi ngôn ngữ hiển thị tức thì
+TRANSLATE_ALL_LANGS  = bool(config.get("TRANSLATE_ALL_LANGS", False))
+
+# ---- translation cache (SQLite); để "" để tắt ----
+TRANSLATE_CACHE_FILE        = config.get("TRANSLATE_CACHE_FILE", "translate_cache.sqlite3")
+TRANSLATE_CACHE_TTL_DAYS    = float(config.get("TRANSLATE_CACHE_TTL_DAYS", 30))
+TRANSLATE_CACHE_MAX_ENTRIES = int(config.get("TRANSLATE_CACHE_MAX_ENTRIES", 20000))
+
+# ---- circuit breaker cho từng provider dịch ----
+BREAKER_FAILURE_THRESHOLD = int(config.get("BREAKER_FAILURE_THRESHOLD", 3))
+BREAKER_COOLDOWN_SEC      = float(config.get("BREAKER_COOLDOWN_SEC", 60))
+
+# ---- hedged request: mention chờ quá percentile latency của Gemini thì gọi song song tầng sau ----
+HEDGE_MENTIONS          = bool(config.get("HEDGE_MENTIONS", True))
+HEDGE_PERCENTILE        = float(config.get("HEDGE_PERCENTILE", 90))
+HEDGE_MIN_DELAY_SEC     = float(config.get("HEDGE_MIN_DELAY_SEC", 0.5))
+HEDGE_DEFAULT_DELAY_SEC = float(config.get("HEDGE_DEFAULT_DELAY_SEC", 3.0))
+
+# ---- micro-batch: gom message trong BATCH_WINDOW_MS rồi dịch 1 request Gemini; 0 để tắt ----
+BATCH_WINDOW_MS = int(config.get("BATCH_WINDOW_MS", 400))
+BATCH_MAX_ITEMS = int(config.get("BATCH_MAX_ITEMS", 20))
+BATCH_MAX_CHARS = int(config.get("BATCH_MAX_CHARS", 8000))
+
+# ---- số kết nối keep-alive tối đa giữ cho mỗi provider ----
+HTTP_POOL_SIZE = int(config.get("HTTP_POOL_SIZE", 10))
+
+# ---- quota Gemini phía client (0 = không giới hạn) ----
+GEMINI_RPM              = float(config.get("GEMINI_RPM", 15))
+GEMINI_TPM              = float(config.get("GEMINI_TPM", 250000))
+RATE_LIMIT_MAX_WAIT_SEC = float(config.get("RATE_LIMIT_MAX_WAIT_SEC", 10))
+
+# ---- nhận diện ngôn ngữ cục bộ: message đã ở ngôn ngữ đích thì không gửi đi dịch ----
+LANG_DETECT_ENABLED        = bool(config.get("LANG_DETECT_ENABLED", True))
+LANG_DETECT_MIN_CONFIDENCE = float(config.get("LANG_DETECT_MIN_CONFIDENCE", 0.85))
+
+# ---- lịch sử trong cửa sổ: số message giữ trong RAM / số entry tối đa trong DOM ----
+GUI_HISTORY_LIMIT = int(config.get("GUI_HISTORY_LIMIT", 1000))
+GUI_DOM_WINDOW    = int(config.get("GUI_DOM_WINDOW", 200))
+GUI_PAGE_SIZE     = int(config.get("GUI_PAGE_SIZE", 50))
+# gom message / bản dịch / bộ đếm đến trong GUI_FRAME_MS rồi cập nhật giao diện 1 lần
+GUI_FRAME_MS      = int(config.get("GUI_FRAME_MS", 50))
+
+# ---- lịch sử message có cấu trúc (SQLite): khôi phục khi khởi động, phân trang; "" để tắt ----
+MESSAGE_STORE_FILE = config.get("MESSAGE_STORE_FILE", "messages.sqlite3")
+
+# ---- backend render markdown: "markdown" (Python-Markdown) / "markdown-it" / "mistune" ----
+MARKDOWN_BACKEND = config.get("MARKDOWN_BACKEND", "markdown")
+
+# ---- websocket client: "thread" (websocket-client + worker thread) / "asyncio" (qasync + aiohttp) ----
+WS_CLIENT_MODE = config.get("WS_CLIENT_MODE", "thread")
+
+# ---- heartbeat websocket (ping mỗi WS_PING_INTERVAL_SEC, không có pong sau WS_PING_TIMEOUT_SEC → coi như mất kết nối) ----
+WS_PING_INTERVAL_SEC = float(config.get("WS_PING_INTERVAL_SEC", 20))
+WS_PING_TIMEOUT_SEC  = float(config.get("WS_PING_TIMEOUT_SEC", 10))
+# ---- reconnect: chờ base * 2^n (có jitter), tối đa max giây ----
+RECONNECT_BASE_SEC   = float(config.get("RECONNECT_BASE_SEC", 1))
+RECONNECT_MAX_SEC    = float(config.get("RECONNECT_MAX_SEC", 60))
+
+# ---- reconnect: lấy bù post bị lỡ qua REST (posts?since=) trước khi xử lý tiếp message live ----
+CATCHUP_ENABLED      = bool(config.get("CATCHUP_ENABLED", True))
+CATCHUP_MAX_AGE_MIN  = float(config.get("CATCHUP_MAX_AGE_MIN", 24 * 60))  # không lấy bù xa hơn
+CATCHUP_TIMEOUT_SEC  = float(config.get("CATCHUP_TIMEOUT_SEC", 10))
+CATCHUP_WORKERS      = int(config.get("CATCHUP_WORKERS", 4))
+
+# ---- backend JSON giải mã frame websocket: "json" / "orjson" / "ujson" ----
+WS_JSON_BACKEND = config.get("WS_JSON_BACKEND", "json")
+
+# ---- ghi log HTML ở thread riêng: gom entry, ghi mỗi LOG_FLUSH_INTERVAL_MS hoặc khi đủ LOG_BATCH_SIZE ----
+LOG_FLUSH_INTERVAL_MS = int(config.get("LOG_FLUSH_INTERVAL_MS", 500))
+LOG_BATCH_SIZE        = int(config.get("LOG_BATCH_SIZE", 50))
+
 cookies = {"MMUSERID": MMUSERID, "MMAUTHTOKEN": MMAUTHTOKEN}
@@ -1,14 +1,14 @@
 # html_log.py
 import os
+import re
+import threading
 import html as html_lib
 from datetime import datetime
-from markdown import markdown
 
 from config_loader import HTML_LOG_FILE
 
 # ---------------- HTML header/footer ----------------
-MAX_LOG_BYTES = 5 * 1024 * 1024
-ROTATE_TARGET_RATIO = 0.9
+MAX_LOG_BYTES = 5 * 1024 * 1024   # kích thước tối đa 1 segment
 
 HTML_HEADER = """<html><head><meta charset='utf-8'>
 <style>
@@ -74,84 +74,213 @@ pre, code {
     overflow-wrap:anywhere;
     word-break:break-word;
 }
+/* bật/tắt bản gốc / bản dịch cho cả lịch sử: chỉ đổi class của .container */
+.container.hide-original .content,
+.container.hide-translated .translated {display:none;}
 </style></head><body><div class="container">\n"""
 
 HTML_FOOTER = "</div></body></html>\n"
 
 
-def init_html_log():
-    """Tạo file log HTML nếu chưa có"""
-    if not os.path.exists(HTML_LOG_FILE):
-        with open(HTML_LOG_FILE, "w", encoding="utf-8") as f:
-            f.write(HTML_HEADER + HTML_FOOTER)
+# ---------------- Segments ----------------
+# Log được chia thành file theo ngày (kèm số thứ tự nếu 1 ngày vượt MAX_LOG_BYTES) trong
+# thư mục <tên log>_logs/; HTML_LOG_FILE chỉ còn là trang index nhỏ liệt kê các file đó.
+# Đổi segment = mở file mới (O(1)), không cắt bỏ lịch sử cũ.
+LOG_DIR = os.path.splitext(HTML_LOG_FILE)[0] + "_logs"
+
+_ENTRY_START = "<div class='msg"
+_KEY_RE = re.compile(r"data-key='([^']*)'")
+
+_current = {"day": None, "path": None, "part": 0}
+_index_lock = threading.Lock()  # index được sinh lại từ cả GUI (open_log) lẫn thread ghi log
 
 
-def rotate_html_log_if_needed():
-    """Xoay log khi vượt quá dung lượng cho phép"""
+def _segment_path(day: str, part: int) -> str:
+    name = f"{day}.html" if part == 0 else f"{day}_{part:03d}.html"
+    return os.path.join(LOG_DIR, name)
+
+
+def list_segments():
+    """Các file segment, cũ -> mới."""
+    try:
+        names = sorted(n for n in os.listdir(LOG_DIR) if n.endswith(".html"))
+    except Exception:
+        return []
+    return [os.path.join(LOG_DIR, n) for n in names]
+
+
+def write_index():
+    """Sinh lại trang index (HTML_LOG_FILE) trỏ tới các segment, mới nhất lên đầu."""
+    rows = []
+    for path in reversed(list_segments()):
+        name = os.path.basename(path)
+        try:
+            size_kb = os.path.getsize(path) / 1024
+        except Exception:
+            size_kb = 0
+        rel = os.path.relpath(path, os.path.dirname(os.path.abspath(HTML_LOG_FILE)))
+        href = html_lib.escape(rel.replace(os.sep, "/"))
+        rows.append(f"<li><a href='{href}'>{html_lib.escape(name[:-5])}</a> "
+                    f"<span class='timestamp'>({size_kb:.0f} KB)</span></li>")
+    body = "<h3>Message log</h3><ul>" + "".join(rows) + "</ul>\n"
+    try:
+        with _index_lock, open(HTML_LOG_FILE, "w", encoding="utf-8") as f:
+            f.write(HTML_HEADER + body + HTML_FOOTER)
+    except Exception:
+        pass
+
+
+def _migrate_single_file_log():
+    """Log kiểu cũ (1 file chứa message) → chuyển nguyên vào thư mục segment."""
     try:
-        if not os.path.exists(HTML_LOG_FILE):
-            return
-        size = os.path.getsize(HTML_LOG_FILE)
-        if size <= MAX_LOG_BYTES:
-            return
         with open(HTML_LOG_FILE, "r", encoding="utf-8") as f:
             content = f.read()
-        if HTML_HEADER in content:
-            body = content.replace(HTML_HEADER, "").replace(HTML_FOOTER, "")
-            parts = body.split("<div class='msg")
-            if len(parts) <= 1:
-                return
-            prefix = parts[0]
-            blocks = ["<div class='msg" + p for p in parts[1:]]
-            target_size = int(MAX_LOG_BYTES * ROTATE_TARGET_RATIO)
-            kept = []
-            for i in range(len(blocks)-1, -1, -1):
-                kept.append(blocks[i])
-                candidate = HTML_HEADER + prefix + "".join(reversed(kept)) + HTML_FOOTER
-                if len(candidate.encode("utf-8")) >= target_size:
-                    break
-            with open(HTML_LOG_FILE, "w", encoding="utf-8") as f:
-                f.write(HTML_HEADER + prefix + "".join(reversed(kept)) + HTML_FOOTER)
+    except Exception:
+        return
+    if _ENTRY_START not in content:
+        return
+    stamp = datetime.fromtimestamp(os.path.getmtime(HTML_LOG_FILE)).strftime("%Y%m%d%H%M%S")
+    os.replace(HTML_LOG_FILE, os.path.join(LOG_DIR, f"0000_legacy_{stamp}.html"))
+
+
+def init_html_log():
+    """Tạo thư mục segment, chuyển log kiểu cũ vào đó và sinh lại trang index"""
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        if os.path.exists(HTML_LOG_FILE):
+            _migrate_single_file_log()
+        write_index()
     except Exception:
         pass
 
 
-def append_html(sender, channel_name, text, css_class="normal", translated=""):
-    """Thêm một entry mới vào log HTML (ghi cũ->mới như trước)"""
-    rotate_html_log_if_needed()
-    safe_text = html_lib.escape(text or "")
-    safe_trans = html_lib.escape(translated or "")
-    html_text = markdown(safe_text, extensions=["fenced_code", "tables"])
-    html_trans = markdown(safe_trans, extensions=["fenced_code", "tables"]) if safe_trans else ""
-    content_cls = "mention" if css_class == "mention" else ""
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    entry = (
-        f"<div class='msg {content_cls}'>"
-        f"<div class='timestamp'>[{html_lib.escape(ts)}]</div>"
-        f"<div><span class='sender'>{html_lib.escape(sender)}</span> "
-        f"in <span class='channel'>{html_lib.escape(channel_name)}</span></div>"
-        f"<div class='content'>{html_text}</div>"
-    )
-    if html_trans:
-        entry += f"<div class='translated'>{html_trans}</div>"
-    entry += "</div>\n"
+def _current_segment() -> str:
+    """Segment đang ghi: đổi file khi sang ngày mới hoặc file hiện tại vượt MAX_LOG_BYTES."""
+    day = datetime.now().strftime("%Y-%m-%d")
+    if _current["day"] != day:
+        part = 0
+        while os.path.exists(_segment_path(day, part + 1)):
+            part += 1  # khởi động lại giữa ngày: ghi tiếp vào phần mới nhất
+        _current.update(day=day, part=part, path=_segment_path(day, part))
+    try:
+        if os.path.getsize(_current["path"]) > MAX_LOG_BYTES:
+            _current["part"] += 1
+            _current["path"] = _segment_path(day, _current["part"])
+    except OSError:
+        pass
+    if not os.path.exists(_current["path"]):
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            with open(_current["path"], "w", encoding="utf-8") as f:
+                f.write(HTML_HEADER + HTML_FOOTER)
+        except Exception:
+            pass
+        write_index()
+    return _current["path"]
+
 
+def _segment_entries(path: str):
+    """Đọc 1 segment → list (key, html) theo thứ tự cũ->mới. Entry cũ không có data-key → key '<file>#<i>'."""
     try:
-        if os.path.exists(HTML_LOG_FILE):
-            with open(HTML_LOG_FILE, "r", encoding="utf-8") as f:
-                content = f.read()
-            if content.endswith(HTML_FOOTER):
-                new_content = content[:-len(HTML_FOOTER)] + entry + HTML_FOOTER
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except Exception:
+        return []
+    body = content.replace(HTML_HEADER, "").replace(HTML_FOOTER, "")
+    name = os.path.basename(path)
+    entries = []
+    for i, part in enumerate(body.split(_ENTRY_START)[1:]):
+        block = _ENTRY_START + part
+        # data-key nằm trong thẻ mở; nội dung message đã escape nên không khớp nhầm
+        m = _KEY_RE.search(block, 0, block.find(">") + 1)
+        key = html_lib.unescape(m.group(1)) if m else f"{name}#{i}"
+        entries.append((key, block))
+    return entries
+
+
+def _find(segments, key):
+    """(vị trí segment, entries của segment, vị trí entry) của lần xuất hiện gần nhất của key."""
+    for si in range(len(segments) - 1, -1, -1):
+        entries = _segment_entries(segments[si])
+        # key local-N lặp lại giữa các lần chạy → lấy lần xuất hiện gần nhất
+        index = {k: i for i, (k, _) in enumerate(entries)}
+        if key in index:
+            return si, entries, index[key]
+    return None, [], None
+
+
+def read_entries(before_key=None, after_key=None, count=50):
+    """
+    Lấy tối đa `count` entry (key, html) từ log, liền trước before_key hoặc liền sau after_key
+    (theo thứ tự cũ->mới), đọc qua nhiều segment nếu cần. Không tìm thấy key → [].
+    """
+    segments = list_segments()
+    if before_key is not None:
+        si, entries, i = _find(segments, before_key)
+        if si is None:
+            return []
+        out = entries[:i]
+        while len(out) < count and si > 0:
+            si -= 1
+            out = _segment_entries(segments[si]) + out
+        return out[-count:] if count > 0 else []
+    if after_key is not None:
+        si, entries, i = _find(segments, after_key)
+        if si is None:
+            return []
+        out = entries[i + 1:]
+        while len(out) < count and si < len(segments) - 1:
+            si += 1
+            out += _segment_entries(segments[si])
+        return out[:count]
+    out = []
+    for path in reversed(segments):
+        if len(out) >= count:
+            break
+        out = _segment_entries(path) + out
+    return out[-count:] if count > 0 else []
+
+
+def append_entries(entries):
+    """Ghi nhiều entry đã render vào segment hiện tại bằng 1 lần ghi."""
+    if entries:
+        _append_entry(_current_segment(), "".join(entries))
+
+
+_FOOTER_BYTES = HTML_FOOTER.encode("utf-8")
+# file tạo bằng text mode trên Windows có footer kết thúc bằng \r\n
+_FOOTER_VARIANTS = (_FOOTER_BYTES, HTML_FOOTER.replace("\n", "\r\n").encode("utf-8"))
+
+
+def _append_entry(path: str, entry: str):
+    """
+    Ghi entry ngay trước footer mà không đọc/ghi lại cả file: seek tới offset của footer,
+    ghi đè entry + footer. Chi phí tỉ lệ với kích thước entry, không phải kích thước log.
+    """
+    data = entry.encode("utf-8")
+    try:
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(HTML_HEADER.encode("utf-8") + data + _FOOTER_BYTES)
+            return
+        with open(path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            tail_len = max(len(v) for v in _FOOTER_VARIANTS)
+            f.seek(max(0, size - tail_len))
+            tail = f.read()
+            for footer in _FOOTER_VARIANTS:
+                if tail.endswith(footer):
+                    f.seek(size - len(footer))
+                    break
             else:
-                new_content = content + entry
-            with open(HTML_LOG_FILE, "w", encoding="utf-8") as f:
-                f.write(new_content)
-        else:
-            with open(HTML_LOG_FILE, "w", encoding="utf-8") as f:
-                f.write(HTML_HEADER + entry + HTML_FOOTER)
+                f.seek(size)
+            # không thấy footer (file bị sửa tay / ghi dở): nối tiếp ở cuối, trình duyệt vẫn hiển thị được
+            f.write(data + _FOOTER_BYTES)
+            f.truncate()
     except Exception:
         try:
-            with open(HTML_LOG_FILE, "a", encoding="utf-8") as f:
+            with open(path, "a", encoding="utf-8") as f:
                 f.write(entry)
         except Exception:
             pass
@@ -0,0 +1,94 @@
+# http_transport.py
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ProviderTransport:
+    """
+    Session keep-alive riêng cho 1 provider dịch (pool kết nối có kích thước cố định),
+    kèm số đo thời gian từng request.
+
+    requests/urllib3 không tách được DNS/connect/TLS cho từng request, nên:
+      - mỗi request ghi total, ttfb (resp.elapsed = tới lúc nhận header) và new_conn
+        (request có phải mở kết nối mới không, dựa vào bộ đếm của connection pool);
+      - prewarm() đo riêng DNS (getaddrinfo) và connect+TLS (request đầu tiên).
+    """
+    def __init__(self, name: str, pool_size: int = 10):
+        self.name = name
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, int(pool_size)))
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.timings = deque(maxlen=200)
+        self.warmup = {}
+        self._lock = threading.Lock()
+
+    def post(self, url: str, **kwargs):
+        before = self._connections_opened(url)
+        t0 = time.perf_counter()
+        resp = self.session.post(url, **kwargs)
+        total = time.perf_counter() - t0
+        self._record(total, resp.elapsed.total_seconds(), self._connections_opened(url) > before)
+        return resp
+
+    def prewarm(self, url: str, timeout: float = 5.0):
+        """Mở sẵn kết nối (DNS + TCP + TLS) ở background để message đầu không phải chờ handshake."""
+        if not url:
+            return
+        threading.Thread(target=self._prewarm, args=(url, timeout),
+                         name=f"prewarm-{self.name}", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = list(self.timings)
+        new = sorted(t for t, _, n in samples if n)
+        reused = sorted(t for t, _, n in samples if not n)
+        ttfb = sorted(f for _, f, _ in samples)
+        return {
+            "requests": len(samples),
+            "new_connections": len(new),
+            "p50_total_new_conn": _median(new),
+            "p50_total_reused": _median(reused),
+            "p50_ttfb": _median(ttfb),
+            "warmup": dict(self.warmup),
+        }
+
+    def _record(self, total: float, ttfb: float, new_conn: bool):
+        with self._lock:
+            self.timings.append((total, ttfb, new_conn))
+
+    def _connections_opened(self, url: str) -> int:
+        try:
+            return self._adapter.poolmanager.connection_from_url(url).num_connections
+        except Exception:
+            return 0
+
+    def _prewarm(self, url: str, timeout: float):
+        parts = urlsplit(url)
+        host = parts.hostname
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            t0 = time.perf_counter()
+            socket.getaddrinfo(host, port)
+            self.warmup["dns"] = time.perf_counter() - t0
+        except Exception:
+            pass
+        try:
+            t0 = time.perf_counter()
+            # status code không quan trọng, chỉ cần kết nối được giữ lại trong pool
+            self.session.head(f"{parts.scheme}://{parts.netloc}/", timeout=timeout)
+            self.warmup["connect_tls"] = time.perf_counter() - t0
+        except Exception:
+            pass
+
+
+def _median(values):
+    if not values:
+        return None
+    return values[len(values) // 2]
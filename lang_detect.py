@@ -0,0 +1,153 @@
+# lang_detect.py
+"""
+Nhận diện ngôn ngữ cục bộ (không gọi mạng) cho các ngôn ngữ app dịch: vi / en / ja / id.
+
+  1) Loại bỏ phần không phải văn xuôi (code block, inline code, URL, @mention).
+  2) Heuristic theo bảng chữ: kana/kanji → ja; phần lớn từ mang dấu, có chữ đặc trưng
+     tiếng Việt (ă â đ ê ô ơ ư, dấu thanh) → vi. Độ tin cậy tính theo tỉ lệ từ có dấu,
+     nên câu tiếng Anh kèm "cảm ơn" ở cuối không bị coi là tiếng Việt.
+  3) Còn lại là chữ Latin không dấu: mô hình trigram ký tự nhỏ (vi không dấu / en / id)
+     cộng điểm từ phổ biến.
+"""
+import math
+import re
+import unicodedata
+
+_CODE_FENCE_RE = re.compile(r"```.*?(```|$)", re.DOTALL)
+_INLINE_CODE_RE = re.compile(r"`[^`\n]*`")
+_URL_RE = re.compile(r"(https?://|www\.)\S+", re.IGNORECASE)
+_MENTION_RE = re.compile(r"[@#~][\w.\-]+")
+
+# chữ cái chỉ (hoặc gần như chỉ) xuất hiện trong tiếng Việt
+_VI_LETTERS = set("ăâđêôơưĂÂĐÊÔƠƯ")
+_VI_TONE_RANGE = (0x1EA0, 0x1EF9)  # Latin Extended Additional: ạ ả ấ ầ ẩ ẫ ậ ... ỹ
+# văn xuôi tiếng Việt có dấu: đa số âm tiết mang dấu (kể cả khi xen từ kỹ thuật tiếng Anh)
+VI_MIN_WORD_SHARE = 0.4
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+# Mẫu văn bản ngắn để dựng profile trigram (tiếng Việt viết không dấu)
+_SAMPLES = {
+    "en": (
+        "hi team, please check the build before the release. i think the deploy is done "
+        "but the tests are still failing on the staging server. can you take a look when "
+        "you have time? thanks for the quick fix, it works now. let me know if there is "
+        "anything else we need to update in the document. the meeting will start at three "
+        "and we should review the issue with the customer. what do you think about this "
+        "change? i will send the report tomorrow morning."
+    ),
+    "id": (
+        "halo tim, tolong cek build sebelum rilis. saya pikir deploy sudah selesai tapi "
+        "tesnya masih gagal di server staging. bisa tolong dilihat kalau ada waktu? terima "
+        "kasih untuk perbaikannya, sekarang sudah berjalan. kabari saya jika ada yang perlu "
+        "diperbarui di dokumen. rapat akan dimulai jam tiga dan kita harus membahas masalah "
+        "ini dengan pelanggan. bagaimana pendapat kamu tentang perubahan ini? saya akan "
+        "mengirim laporan besok pagi."
+    ),
+    "vi": (
+        "chao team, nho kiem tra ban build truoc khi release nhe. em nghi la deploy xong roi "
+        "nhung test van con loi tren server staging. anh co the xem giup khi nao ranh duoc "
+        "khong? cam on anh da sua nhanh, bay gio chay duoc roi. bao em neu can cap nhat gi "
+        "them trong tai lieu. cuoc hop se bat dau luc ba gio va chung ta can xem lai van de "
+        "voi khach hang. anh thay thay doi nay the nao? em se gui bao cao vao sang mai."
+    ),
+}
+
+_STOPWORDS = {
+    "en": set("the a an is are was were be to of and in on for with this that it you i we "
+              "they he she not do does can will please thanks have has what when how".split()),
+    "id": set("yang dan di ke dari ini itu untuk dengan tidak ada saya kamu kita kami akan "
+              "sudah belum bisa tolong terima kasih juga atau jika tapi apa".split()),
+    "vi": set("la va cua cho voi khong duoc nhung nay roi em anh chi minh ban nhe a oi thi "
+              "co trong khi da se dang can lam gi sao vay nua".split()),
+}
+
+# từ tiếng Việt không dấu, không trùng từ phổ biến của tiếng Anh / Indonesia
+_VI_PLAIN_WORDS = _STOPWORDS["vi"] - _STOPWORDS["en"] - _STOPWORDS["id"] - {"a"}
+
+MIN_LETTERS = 6
+
+
+def _is_vi_letter(c: str) -> bool:
+    return c in _VI_LETTERS or _VI_TONE_RANGE[0] <= ord(c) <= _VI_TONE_RANGE[1]
+
+
+def _is_marked(c: str) -> bool:
+    """Chữ có dấu (á, ề, ơ, đ...) — á / à / ã... cũng có trong tiếng Việt nên tính cả."""
+    return _is_vi_letter(c) or any(unicodedata.combining(x) for x in unicodedata.normalize("NFD", c))
+
+
+def _strip_accents(s: str) -> str:
+    s = s.replace("đ", "d").replace("Đ", "D")
+    return "".join(c for c in unicodedata.normalize("NFD", s) if not unicodedata.combining(c))
+
+
+def _trigrams(s: str):
+    s = " " + re.sub(r"[^a-z]+", " ", s).strip() + " "
+    return [s[i:i + 3] for i in range(len(s) - 2)]
+
+
+def _build_profile(sample: str):
+    counts = {}
+    for g in _trigrams(sample):
+        counts[g] = counts.get(g, 0) + 1
+    total = sum(counts.values())
+    vocab = len(counts) + 1
+    return {g: math.log((c + 1) / (total + vocab)) for g, c in counts.items()}, math.log(1 / (total + vocab))
+
+
+_PROFILES = {lang: _build_profile(sample) for lang, sample in _SAMPLES.items()}
+
+
+def strip_non_prose(text: str) -> str:
+    """Bỏ code block, inline code, URL, @mention — những phần không mang ngôn ngữ."""
+    text = _CODE_FENCE_RE.sub(" ", text or "")
+    text = _INLINE_CODE_RE.sub(" ", text)
+    text = _URL_RE.sub(" ", text)
+    return _MENTION_RE.sub(" ", text)
+
+
+def detect_language(text: str):
+    """
+    Trả về (mã ngôn ngữ, độ tin cậy 0..1). Không đoán được → ("", 0.0).
+    """
+    body = strip_non_prose(text)
+    letters = [c for c in body if c.isalpha()]
+    if len(letters) < MIN_LETTERS:
+        return "", 0.0
+
+    kana = sum(1 for c in letters if "぀" <= c <= "ヿ")
+    cjk = sum(1 for c in letters if "一" <= c <= "鿿")
+    if (kana + cjk) / len(letters) >= 0.3:
+        # có kana → chắc chắn tiếng Nhật; chỉ kanji thì có thể là tiếng Trung
+        return "ja", (0.97 if kana else 0.75)
+
+    latin = [c for c in letters if c.isascii() or "À" <= c <= "ɏ" or
+             _VI_TONE_RANGE[0] <= ord(c) <= _VI_TONE_RANGE[1]]
+    if not latin:
+        return "", 0.0
+
+    words = _WORD_RE.findall(body)
+    marked = [w for w in words if any(_is_marked(c) for c in w)]
+    if marked and any(_is_vi_letter(c) for w in marked for c in w):
+        # âm tiết không dấu nhưng chắc chắn là tiếng Việt (anh, em, khi...) cũng tính
+        plain_vi = sum(1 for w in words if w.lower() in _VI_PLAIN_WORDS)
+        share = (len(marked) + plain_vi) / len(words)
+        if share >= VI_MIN_WORD_SHARE:
+            # 40% từ có dấu → 0.79, 50% → 0.85, 75% trở lên → ~0.99
+            return "vi", min(0.99, 0.55 + 0.6 * share)
+
+    plain = _strip_accents(body.lower())
+    grams = _trigrams(plain)
+    words = re.findall(r"[a-z]+", plain)
+    scores = {}
+    for lang, (profile, unseen) in _PROFILES.items():
+        ll = sum(profile.get(g, unseen) for g in grams)
+        ll += 2.0 * sum(1 for w in words if w in _STOPWORDS[lang])
+        scores[lang] = ll
+
+    best = max(scores, key=scores.get)
+    # softmax trên log-likelihood (chia theo số trigram để câu dài không bão hoà quá sớm)
+    scale = max(1.0, len(grams) / 8.0)
+    exps = {lang: math.exp((s - scores[best]) / scale) for lang, s in scores.items()}
+    confidence = exps[best] / sum(exps.values())
+    return best, confidence
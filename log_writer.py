@@ -0,0 +1,93 @@
+# log_writer.py
+import queue
+import threading
+import time
+
+from html_log import append_entries
+
+
+class LogWriter:
+    """
+    Thread ghi log HTML. GUI chỉ gọi put() với fragment đã render (render.render_entry, dùng
+    chung với view — không render markdown lần 2); thread này gom entry và ghi 1 lần mỗi
+    flush_interval giây hoặc khi đủ batch_size entry.
+    stop() ghi nốt phần còn lại — gọi khi app thoát.
+    """
+    _STOP = object()
+
+    def __init__(self, flush_interval=0.5, batch_size=50, max_queue=5000):
+        self._flush_interval = max(0.0, float(flush_interval or 0))
+        self._batch_size = max(1, int(batch_size or 1))
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue or 1)))
+        self._thread = None
+
+        self.dropped = 0  # entry bị bỏ vì hàng đợi đầy
+        self.flushes = 0  # số lần ghi xuống đĩa
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, fragment: str) -> bool:
+        """Đưa 1 entry (HTML) vào hàng đợi ghi log. Trả về False nếu hàng đợi đầy."""
+        try:
+            self._queue.put_nowait(fragment)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=5.0) -> bool:
+        """Chờ tới khi mọi entry đã put() trước đó được ghi xuống đĩa."""
+        if not self._thread:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        """Ghi nốt hàng đợi rồi dừng thread."""
+        t, self._thread = self._thread, None
+        if not t:
+            return
+        self._queue.put(self._STOP)
+        t.join(timeout)
+
+    def _run(self):
+        while True:
+            pending, markers, stop = [], [], False
+            item = self._queue.get()
+            deadline = time.monotonic() + self._flush_interval
+            while True:
+                if item is self._STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    markers.append(item)
+                    break
+                pending.append(item)
+                if len(pending) >= self._batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(pending)
+            for ev in markers:
+                ev.set()
+            if stop:
+                return
+
+    def _write(self, items):
+        if not items:
+            return
+        try:
+            append_entries(items)
+            self.flushes += 1
+        except Exception:
+            pass
@@ -1,8 +1,8 @@
 # main_window.py
 import os
-import html as html_lib
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from markdown import markdown
 
 from PyQt6.QtCore import Qt, QTimer, QPropertyAnimation, pyqtProperty
 from PyQt6.QtWidgets import (
@@ -12,12 +12,138 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtGui import QFont, QPainter, QBrush, QColor
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 
-from config_loader import HTML_LOG_FILE, MY_USERNAME
+from config_loader import (
+    HTML_LOG_FILE, MY_USERNAME, TRANSLATE_ALL_LANGS,
+    GUI_HISTORY_LIMIT, GUI_DOM_WINDOW, GUI_PAGE_SIZE,
+    LOG_FLUSH_INTERVAL_MS, LOG_BATCH_SIZE, GUI_FRAME_MS,
+)
 from signals_bus import signals
-from html_log import HTML_HEADER, HTML_FOOTER, append_html
+from html_log import HTML_HEADER, HTML_FOOTER, read_entries, write_index
+from log_writer import LogWriter
+from message_store import STORE
+from render import render_entry, entry_dom_id
 from webview_pages import ExternalLinkPage
 
 
+# ===================== Shell page =====================
+# Trang được load 1 lần; message mới được chèn vào DOM qua runJavaScript
+# (không setHtml lại toàn bộ lịch sử mỗi lần có message).
+SHELL_SCRIPT = r"""<script>
+(function(){
+    var mmTail = true;      // DOM đang chứa message mới nhất
+    var mmLoading = false;  // đang chờ Python trả trang cũ/mới hơn
+    var mmNoOlder = false;  // đã hết message cũ hơn để tải
+    function cont(){ return document.querySelector('.container'); }
+    function scroller(){ return document.scrollingElement || document.documentElement; }
+    function nearBottom(){
+        var el = scroller();
+        return (el.scrollHeight - el.scrollTop - window.innerHeight) < 60;
+    }
+    function toBottom(){ var el = scroller(); el.scrollTop = el.scrollHeight; }
+    function keyOf(el){ return el ? (el.getAttribute('data-key') || '') : ''; }
+    // giữ nguyên vị trí entry đang nhìn khi thêm/bớt node phía trên
+    function keepAnchor(fn){
+        var c = cont(), a = null;
+        for (var i = 0; c && i < c.children.length; i++){
+            if (c.children[i].getBoundingClientRect().bottom > 0){ a = c.children[i]; break; }
+        }
+        var before = a ? a.getBoundingClientRect().top : 0;
+        fn();
+        if (a && a.isConnected){
+            var d = a.getBoundingClientRect().top - before;
+            if (d) scroller().scrollTop += d;
+        }
+    }
+    function trimTop(c, max){
+        while (c.children.length > max){ c.removeChild(c.firstElementChild); mmNoOlder = false; }
+    }
+    function trimBottom(c, max){
+        while (c.children.length > max){ c.removeChild(c.lastElementChild); mmTail = false; }
+    }
+
+    function applyUpdates(map){
+        for (var id in map){
+            var el = document.getElementById(id);
+            if (el) el.outerHTML = map[id];
+        }
+    }
+
+    // 1 frame: thay các entry đã đổi (bản dịch đến, đổi ngôn ngữ) + thêm message mới vào cuối
+    // (chỉ khi DOM đang ở đoạn mới nhất), rồi cuộn 1 lần nếu người dùng đang ở cuối trang
+    window.mmBatch = function(items, updates, max){
+        var c = cont();
+        if (!c) return false;
+        var add = items.length && mmTail;
+        if (nearBottom()){
+            applyUpdates(updates);
+            if (add){ c.insertAdjacentHTML('beforeend', items.join('')); trimTop(c, max); }
+            toBottom();
+        } else {
+            keepAnchor(function(){
+                applyUpdates(updates);
+                if (add){ c.insertAdjacentHTML('beforeend', items.join('')); trimTop(c, 2 * max); }
+            });
+        }
+        return true;
+    };
+    // trang cũ hơn (cuộn lên đầu)
+    window.mmPrepend = function(items, max){
+        var c = cont();
+        mmLoading = false;
+        if (!c) return false;
+        if (!items.length){ mmNoOlder = true; return true; }
+        keepAnchor(function(){
+            c.insertAdjacentHTML('afterbegin', items.join(''));
+            trimBottom(c, max);
+        });
+        return true;
+    };
+    // trang mới hơn (cuộn xuống cuối khi DOM không còn chứa message mới nhất)
+    window.mmAppendNewer = function(items, max, isTail){
+        var c = cont();
+        mmLoading = false;
+        if (!c) return false;
+        keepAnchor(function(){
+            c.insertAdjacentHTML('beforeend', items.join(''));
+            trimTop(c, max);
+        });
+        mmTail = isTail;
+        return true;
+    };
+    // ẩn/hiện bản gốc / bản dịch của toàn bộ lịch sử: 1 lần đổi class, không render lại
+    window.mmSetVisibility = function(showOriginal, showTranslated){
+        var c = cont();
+        if (!c) return false;
+        c.classList.toggle('hide-original', !showOriginal);
+        c.classList.toggle('hide-translated', !showTranslated);
+        return true;
+    };
+    // key của các entry đang có trong DOM (đổi ngôn ngữ chỉ render lại những entry này)
+    window.mmKeys = function(){
+        var c = cont();
+        return c ? Array.prototype.map.call(c.children, keyOf) : [];
+    };
+    window.mmClear = function(){
+        var c = cont();
+        if (c) c.innerHTML = '';
+        mmTail = true; mmLoading = false; mmNoOlder = true;
+        return true;
+    };
+    window.addEventListener('scroll', function(){
+        var c = cont();
+        if (mmLoading || !c || !c.firstElementChild) return;
+        if (scroller().scrollTop < 300 && !mmNoOlder){
+            mmLoading = true;
+            console.log('mm:older:' + keyOf(c.firstElementChild));
+        } else if (!mmTail && nearBottom()){
+            mmLoading = true;
+            console.log('mm:newer:' + keyOf(c.lastElementChild));
+        }
+    });
+})();
+</script>"""
+
+
 # ===================== ToggleSwitch =====================
 class ToggleSwitch(QPushButton):
     """Custom toggle switch with sliding thumb animation."""
@@ -292,6 +418,28 @@ class MainWindow(QWidget):
 
         # ===== State =====
         self._connected = False  # trạng thái kết nối hiện tại
+        self._conn_stats = {}    # số liệu reconnect từ WSClient (signals.connection_stats)
+        self._entries = {}       # msg_key -> entry gần đây (theo thứ tự đến, tối đa GUI_HISTORY_LIMIT)
+        self._history_floor = False  # đã Clear → không tải lại lịch sử cũ (store / log)
+        self._history_gen = 0        # tăng khi Clear: bỏ trang lịch sử đang đọc dở ở thread nền
+        # đọc trang lịch sử ngoài RAM (message store / segment log 5 MB) ở thread riêng
+        self._history_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self._awaiting = {}      # msg_key -> entry chờ bản dịch để ghi log
+        self._paged = {}         # msg_key -> entry tải từ message store khi cuộn (ngoài RAM, đang trong DOM)
+        self._view_lang = "vi"   # ngôn ngữ bản dịch đang hiển thị
+        self._page_ready = False # shell page đã load xong → được chạy JS
+        self._pending_js = []    # JS chờ shell page load xong
+        # buffer cập nhật UI của frame hiện tại (xem _flush_frame)
+        self._frame_new = []
+        self._frame_updates = {}
+        self._frame_count = None
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setInterval(GUI_FRAME_MS)
+        self._frame_timer.timeout.connect(self._flush_frame)
+        # ghi log ở thread riêng: slot GUI không chạm đĩa
+        self._log_writer = LogWriter(LOG_FLUSH_INTERVAL_MS / 1000.0, LOG_BATCH_SIZE)
+        self._log_writer.start()
 
         # ===== Signals =====
         self.btn_open.clicked.connect(self.open_log, type=Qt.ConnectionType.UniqueConnection)
@@ -299,20 +447,27 @@ class MainWindow(QWidget):
         # KHÔNG gắn left-click cho Settings nữa; chỉ dùng right-click menu ở trên
 
         signals.new_message.connect(self.on_new_message, type=Qt.ConnectionType.UniqueConnection)
+        signals.message_translated.connect(self.on_message_translated, type=Qt.ConnectionType.UniqueConnection)
         signals.set_connected.connect(self.on_set_connected, type=Qt.ConnectionType.UniqueConnection)
+        signals.connection_stats.connect(self.on_connection_stats, type=Qt.ConnectionType.UniqueConnection)
         signals.update_count.connect(self.on_update_count, type=Qt.ConnectionType.UniqueConnection)
+        signals.history_loaded.connect(self._on_history_loaded, type=Qt.ConnectionType.UniqueConnection)
         signals.clicked.connect(self._show_and_scroll_bottom, type=Qt.ConnectionType.QueuedConnection)
 
+        self.show_original_toggle.toggled.connect(self._apply_visibility, type=Qt.ConnectionType.UniqueConnection)
+        self.show_translated_toggle.toggled.connect(self._apply_visibility, type=Qt.ConnectionType.UniqueConnection)
         self.lang_combo.currentTextChanged.connect(self._emit_current_lang, type=Qt.ConnectionType.UniqueConnection)
         self._emit_current_lang()
 
+        self._restore_history()
         QTimer.singleShot(0, self._init_webview)
 
     # ===================== Web content =====================
     def _init_webview(self):
         self.web = QWebEngineView()
-        self.web.setPage(ExternalLinkPage(self.web))
-        self.gui_body = ""
+        page = ExternalLinkPage(self.web)
+        page.bridge_message.connect(self._on_bridge_message)
+        self.web.setPage(page)
         try:
             self.web.loadFinished.disconnect()
         except Exception:
@@ -329,9 +484,199 @@ class MainWindow(QWidget):
         self.set_web_html()
 
     def set_web_html(self):
+        """Load shell page (kèm các entry hiện có) — chỉ gọi lúc khởi tạo webview."""
         if self.web:
-            self.web.setHtml(HTML_HEADER + self.gui_body + HTML_FOOTER)
-            QTimer.singleShot(0, lambda: self.web.page().runJavaScript(self._scroll_bottom_js()))
+            self._page_ready = False
+            self._pending_js = []
+            # chỉ render cửa sổ mới nhất; phần cũ hơn tải khi cuộn lên
+            recent = list(self._entries.values())[-GUI_DOM_WINDOW:]
+            body = "".join(self._render_entry(e) for e in recent)
+            header = HTML_HEADER.replace("</head>", SHELL_SCRIPT + "</head>", 1)
+            header = header.replace('<div class="container">', f'<div class="{self._container_class()}">', 1)
+            self.web.setHtml(header + body + HTML_FOOTER)
+
+    def _container_class(self) -> str:
+        cls = "container"
+        if not self.show_original_toggle.isChecked():
+            cls += " hide-original"
+        if not self.show_translated_toggle.isChecked():
+            cls += " hide-translated"
+        return cls
+
+    def _apply_visibility(self, *_):
+        """Toggle Show Original / Show Translated: áp dụng cho mọi entry đang hiển thị."""
+        show_orig = "true" if self.show_original_toggle.isChecked() else "false"
+        show_trans = "true" if self.show_translated_toggle.isChecked() else "false"
+        self._run_js(f"mmSetVisibility({show_orig}, {show_trans});")
+
+    def _run_js(self, script: str):
+        if not self.web:
+            return  # chưa có webview: entry sẽ có sẵn trong shell page khi load
+        if not self._page_ready:
+            self._pending_js.append(script)
+            return
+        self.web.page().runJavaScript(script)
+
+    # ---- gom cập nhật theo frame: 1 đợt message dồn dập → 1 lần sửa DOM / cuộn / cập nhật bộ đếm ----
+    def _js_append(self, entries):
+        self._frame_new.extend(entries)
+        self._schedule_frame()
+
+    def _js_update(self, entries):
+        for e in entries:
+            self._frame_updates[e["key"]] = e
+        if entries:
+            self._schedule_frame()
+
+    def _schedule_frame(self):
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+    def _flush_frame(self):
+        new, self._frame_new = self._frame_new, []
+        updates, self._frame_updates = self._frame_updates, {}
+        count, self._frame_count = self._frame_count, None
+
+        if new or updates:
+            new_keys = {e["key"] for e in new}
+            # entry mới trong cùng frame đã được render với bản dịch mới nhất
+            payload = {entry_dom_id(k): self._render_entry(e) for k, e in updates.items() if k not in new_keys}
+            items = [self._render_entry(e) for e in new]
+            self._run_js(f"mmBatch({json.dumps(items)}, {json.dumps(payload)}, {GUI_DOM_WINDOW});")
+        if count is not None:
+            self.lbl_count.setText(f"Total messages: {count}")
+
+    # ---- virtualization: JS xin trang cũ/mới hơn qua console bridge ----
+    def _on_bridge_message(self, msg: str):
+        kind, _, key = msg.partition(":")
+        try:
+            if kind == "older":
+                items = self._older_than(key)
+                if items is not None:
+                    self._reply_older(items)
+            elif kind == "newer":
+                page = self._newer_than(key)
+                if page is not None:
+                    self._reply_newer(*page)
+        except Exception:
+            pass
+
+    def _reply_older(self, items):
+        self._run_js(f"mmPrepend({json.dumps(items)}, {GUI_DOM_WINDOW});")
+
+    def _reply_newer(self, items, is_tail):
+        self._run_js(
+            f"mmAppendNewer({json.dumps(items)}, {GUI_DOM_WINDOW}, {'true' if is_tail else 'false'});"
+        )
+
+    def _older_than(self, key: str):
+        """
+        Tối đa GUI_PAGE_SIZE entry liền trước key trong RAM. Hết RAM → đọc message store
+        rồi log HTML ở thread nền, trả None (trả lời sau qua _on_history_loaded).
+        """
+        keys = list(self._entries)
+        if key in self._entries:
+            i = keys.index(key)
+            if i > 0:
+                return [self._render_entry(self._entries[k]) for k in keys[max(0, i - GUI_PAGE_SIZE):i]]
+        if self._history_floor:
+            return []
+        self._history_pool.submit(self._load_history, "older", key, self._history_gen)
+        return None
+
+    def _newer_than(self, key: str):
+        """(entries liền sau key, đã tới message mới nhất chưa); key ngoài RAM → đọc ở thread nền, trả None."""
+        if key not in self._entries:
+            self._history_pool.submit(self._load_history, "newer", key, self._history_gen)
+            return None
+        return self._ram_page(list(self._entries).index(key) + 1)
+
+    def _ram_page(self, i: int):
+        keys = list(self._entries)
+        chunk = keys[i:i + GUI_PAGE_SIZE]
+        return [self._render_entry(self._entries[k]) for k in chunk], i + GUI_PAGE_SIZE >= len(keys)
+
+    def _load_history(self, kind: str, key: str, gen: int):
+        """Thread history: trang trước / sau key từ message store, không có thì từ log HTML."""
+        rows, logged = [], []
+        try:
+            rows = self._store_call("before" if kind == "older" else "after", key, GUI_PAGE_SIZE)
+            if not rows:
+                if kind == "older":
+                    logged = read_entries(before_key=key, count=GUI_PAGE_SIZE)
+                else:
+                    logged = read_entries(after_key=key, count=GUI_PAGE_SIZE)
+        except Exception:
+            pass
+        signals.history_loaded.emit(kind, key, gen, rows, logged)
+
+    def _on_history_loaded(self, kind, key, gen, rows, logged):
+        if gen != self._history_gen:
+            return  # đã Clear trong lúc đọc
+        try:
+            if kind == "older":
+                if rows:
+                    items = [self._render_entry(self._page_entry(r)) for r in rows]
+                else:
+                    items = [html for _, html in logged]
+                self._reply_older(items)
+                return
+            # đọc tiếp store (hoặc log) cho tới khi gặp entry đang có trong RAM
+            items = []
+            for k, item in ([(r["key"], r) for r in rows] if rows else logged):
+                if k in self._entries:
+                    break
+                items.append(self._render_entry(self._page_entry(item)) if rows else item)
+            if items:
+                self._reply_newer(items, False)
+            else:
+                self._reply_newer(*self._ram_page(0))
+        except Exception:
+            pass
+
+    def _page_entry(self, row) -> dict:
+        """Entry của 1 trang tải từ store: giữ lại theo key để đổi ngôn ngữ vẫn render lại được."""
+        entry = self._entry_from_row(row)
+        self._paged[entry["key"]] = entry
+        # DOM giữ tối đa 2 * GUI_DOM_WINDOW entry → không cần nhớ nhiều hơn thế
+        while len(self._paged) > 2 * GUI_DOM_WINDOW:
+            self._paged.pop(next(iter(self._paged)))
+        return entry
+
+    # ---- message store ----
+    def _store_call(self, method: str, *args):
+        if STORE is None:
+            return []
+        try:
+            return getattr(STORE, method)(*args)
+        except Exception:
+            return []
+
+    def _entry_from_row(self, row) -> dict:
+        """Entry hiển thị từ 1 dòng message store (HTML render khi cần, theo ngôn ngữ đang xem)."""
+        translations = dict(row.get("translations") or {})
+        translated = translations.get(self._view_lang, "")
+        if not translated and not TRANSLATE_ALL_LANGS and translations:
+            translated = next(iter(translations.values()))  # bản dịch ở ngôn ngữ đã chọn lúc đó
+        try:
+            ts = datetime.fromtimestamp((row.get("create_at") or 0) / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        except Exception:
+            ts = ""
+        return {
+            "key": row["key"],
+            "sender": row.get("sender") or "",
+            "channel": row.get("channel") or "",
+            "message": row.get("original") or "",
+            "translated": translated,
+            "translations": translations,
+            "css_class": row.get("css_class") or "normal",
+            "ts": ts,
+        }
+
+    def _restore_history(self):
+        """Khởi động: nạp các message gần nhất từ store vào RAM (chưa render)."""
+        for row in self._store_call("recent", GUI_DOM_WINDOW):
+            self._entries[row["key"]] = self._entry_from_row(row)
 
     def _scroll_bottom_js(self) -> str:
         return r"""
@@ -348,13 +693,20 @@ class MainWindow(QWidget):
         """
 
     def _on_web_load_finished(self, ok: bool):
+        self._page_ready = bool(ok)
         try:
+            pending, self._pending_js = self._pending_js, []
+            for script in pending:
+                self.web.page().runJavaScript(script)
             self.web.page().runJavaScript(self._scroll_bottom_js())
         except Exception:
             pass
 
     # ===================== Actions =====================
     def open_log(self):
+        """Mở trang index của log (nhỏ, chỉ chứa link tới các segment theo ngày)."""
+        self._log_writer.flush(1.0)  # entry đang chờ ghi cũng có trong log
+        write_index()  # cập nhật dung lượng các segment
         path = os.path.abspath(HTML_LOG_FILE)
         try:
             if os.path.exists(path):
@@ -416,41 +768,104 @@ class MainWindow(QWidget):
             return
 
     def clear_display_and_reset_count(self):
-        self.gui_body = ""
-        self.set_web_html()
+        self._entries.clear()
+        self._frame_new = []
+        self._frame_updates = {}
+        self._history_floor = True
+        self._history_gen += 1
+        self._paged = {}
+        self._run_js("mmClear();")
         signals.reset_count.emit()
 
-    def on_new_message(self, sender, channel, message, translated):
-        is_personal = (f"@{MY_USERNAME.lower()}" in (message or "").lower())
-        css_class = "mention" if is_personal else "normal"
-        safe_text = html_lib.escape(message or "")
-        safe_trans = html_lib.escape(translated or "")
-        html_text = markdown(safe_text, extensions=["fenced_code", "tables"])
-        html_trans = markdown(safe_trans, extensions=["fenced_code", "tables"]) if safe_trans else ""
-
-        display_html = ""
-        if self.show_original_toggle.isChecked():
-            display_html += f"<div class='content'>{html_text}</div>"
-        if self.show_translated_toggle.isChecked() and html_trans:
-            display_html += f"<div class='translated'>{html_trans}</div>"
-
-        entry = (
-            f"<div class='msg {'mention' if css_class=='mention' else ''}'>"
-            f"<div class='timestamp'>[{html_lib.escape(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))}]</div>"
-            f"<div><span class='sender'>{html_lib.escape(sender)}</span> "
-            f"in <span class='channel'>{html_lib.escape(channel)}</span></div>"
-            f"{display_html}"
-            f"</div>\n"
-        )
+    def _render_entry(self, e) -> str:
+        if not e.get("html"):
+            e["html"] = render_entry(
+                e["key"], e["sender"], e["channel"], e["ts"], e["message"], e["translated"],
+                e["css_class"],
+            )
+        return e["html"]
 
-        self.gui_body += entry
-        self.set_web_html()
+    def on_new_message(self, sender, channel, message, translated, msg_key):
+        is_personal = (f"@{MY_USERNAME.lower()}" in (message or "").lower())
+        entry = {
+            "key": msg_key,
+            "sender": sender,
+            "channel": channel,
+            "message": message,
+            "translated": translated,
+            "translations": {},   # lang -> bản dịch đã nhận
+            "css_class": "mention" if is_personal else "normal",
+            "ts": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self._entries[msg_key] = entry
+        self._awaiting[msg_key] = entry
+        # ring có giới hạn: entry cũ nhất rời RAM (vẫn còn trong log, cuộn lên sẽ tải lại)
+        while len(self._entries) > GUI_HISTORY_LIMIT:
+            self._entries.pop(next(iter(self._entries)))
+        self._js_append([entry])
+
+    def on_message_translated(self, msg_key, target_lang, translated):
+        """
+        Bản dịch từ worker. Lần đầu cho mỗi message: cập nhật entry rồi ghi log.
+        Chế độ all-langs: các ngôn ngữ còn lại chỉ được lưu để đổi ngôn ngữ tức thì.
+        """
+        entry = self._awaiting.pop(msg_key, None)
+        if entry is None:
+            entry = self._entries.get(msg_key)
+            if entry is None or not translated:
+                return
+            entry["translations"][target_lang] = translated
+            if TRANSLATE_ALL_LANGS and target_lang == self._view_lang and entry["translated"] != translated:
+                entry["translated"] = translated
+                entry["html"] = ""
+                self._js_update([entry])
+            return
 
-        append_html(
-            sender, channel, message,
-            css_class=("mention" if css_class == "mention" else "normal"),
-            translated=translated
-        )
+        if translated:
+            entry["translations"][target_lang] = translated
+            entry["translated"] = translated
+            entry["html"] = ""
+            if msg_key in self._entries:
+                self._js_update([entry])
+
+        # fragment của view luôn có đủ bản gốc + bản dịch → ghi nguyên vào log
+        self._log_writer.put(self._render_entry(entry))
+
+    def shutdown_log(self):
+        """Ghi nốt các entry log đang chờ (gọi khi app thoát)."""
+        self._history_pool.shutdown(wait=False)
+        # message chưa có bản dịch (đang dịch / bị hoãn vì hết quota) vẫn vào log, chỉ bản gốc
+        awaiting, self._awaiting = self._awaiting, {}
+        for entry in awaiting.values():
+            self._log_writer.put(self._render_entry(entry))
+        self._log_writer.stop()
+
+    def _show_stored_translations(self, code: str):
+        """
+        All-langs: hiển thị lại lịch sử bằng bản dịch đã lưu, không gọi mạng. Chỉ render lại
+        entry đang có trong DOM (cả trang tải từ store khi cuộn); entry RAM ngoài DOM chỉ đổi
+        dữ liệu, render khi được cuộn tới.
+        """
+        if self.web and self._page_ready:
+            self.web.page().runJavaScript("mmKeys();", lambda keys: self._retranslate(code, keys or []))
+        else:
+            self._retranslate(code, [])
+
+    def _retranslate(self, code: str, dom_keys: list):
+        if code != self._view_lang:
+            return  # đã đổi sang ngôn ngữ khác trong lúc chờ JS
+        in_dom = set(dom_keys)
+        # trang store đã rời DOM thì không cần giữ
+        self._paged = {k: e for k, e in self._paged.items() if k in in_dom}
+        changed = []
+        for e in list(self._entries.values()) + list(self._paged.values()):
+            t = e["translations"].get(code, "")
+            if t != e["translated"]:
+                e["translated"] = t
+                e["html"] = ""
+                if e["key"] in in_dom:
+                    changed.append(e)
+        self._js_update(changed)
 
     # ===================== Bring to front =====================
     def _show_and_scroll_bottom(self):
@@ -477,15 +892,39 @@ class MainWindow(QWidget):
     def on_set_connected(self, ok: bool):
         """Cập nhật trạng thái kết nối (được phát từ nơi quản lý WSClient)."""
         self._connected = bool(ok)
-        if ok:
-            self.lbl_status.setText("Connected")
+        self._refresh_status()
+
+    def on_connection_stats(self, stats: dict):
+        self._conn_stats = dict(stats or {})
+        self._refresh_status()
+
+    def _refresh_status(self):
+        st = self._conn_stats
+        details = []
+        if st.get("reconnects"):
+            details.append(f"Reconnects: {st['reconnects']}")
+        if st.get("last_detect_sec") is not None:
+            details.append(f"Last drop detected after {st['last_detect_sec']} s of silence")
+        if st.get("last_recover_sec") is not None:
+            details.append(f"Last recovery took {st['last_recover_sec']} s")
+        self.lbl_status.setToolTip("\n".join(details))
+
+        if self._connected:
+            text = "Connected"
+            if st.get("reconnects"):
+                text += f" · {st['reconnects']} reconnects"
+            self.lbl_status.setText(text)
             self.lbl_status.setStyleSheet("color:#2563eb;")
         else:
-            self.lbl_status.setText("Not connected")
+            text = "Not connected"
+            if st.get("retry_in") is not None:
+                text += f" · retry #{st.get('attempt', 0)} in {st['retry_in']} s"
+            self.lbl_status.setText(text)
             self.lbl_status.setStyleSheet("color:#b00020;")
 
     def on_update_count(self, count: int):
-        self.lbl_count.setText(f"Total messages: {count}")
+        self._frame_count = count
+        self._schedule_frame()
 
     # ===================== Language broadcast =====================
     def _emit_current_lang(self):
@@ -496,6 +935,9 @@ class MainWindow(QWidget):
             "Japanese":  "ja",
             "Indonesian":"id",
         }.get(name, "vi")
+        self._view_lang = code
+        if TRANSLATE_ALL_LANGS:
+            self._show_stored_translations(code)
         try:
             signals.translate_lang_changed.emit(code)
         except Exception:
@@ -0,0 +1,68 @@
+# md_segments.py
+"""
+Tách phần KHÔNG cần dịch (code block, inline code, stack trace, URL, @mention) ra khỏi
+message thành placeholder ⟦Pn⟧ trước khi gửi dịch, rồi ghép lại đúng nguyên văn sau đó.
+Model chỉ nhận phần văn xuôi → ít token hơn, không phải "chép lại" code.
+"""
+import re
+
+_FENCE_RE = re.compile(r"^[ \t]*(```|~~~)[^\n]*\n.*?^[ \t]*\1[ \t]*$", re.DOTALL | re.MULTILINE)
+_TRACE_RE = re.compile(
+    r"^(?:Traceback \(most recent call last\):"
+    r"|[ \t]+File \"[^\"\n]+\", line \d+.*"
+    r"|[ \t]+at [\w$.<>/]+\(.*\)"
+    r"|[ \t]*Caused by: .*)$",
+    re.MULTILINE,
+)
+# các pattern chạy lần lượt trên skeleton: span sau không được nuốt ⟦Pn⟧ của span trước
+_INLINE_CODE_RE = re.compile(r"`[^`\n⟦⟧]+`")
+_URL_RE = re.compile(r"(?:https?://|www\.)[^\s<>()\[\]⟦⟧]+", re.IGNORECASE)
+_MENTION_RE = re.compile(r"(?<![\w@])[@~][A-Za-z0-9][\w.\-]*")
+
+# thứ tự quan trọng: block lớn trước, rồi đến span nhỏ bên trong văn xuôi
+_PATTERNS = (_FENCE_RE, _TRACE_RE, _INLINE_CODE_RE, _URL_RE, _MENTION_RE)
+
+_TOKEN_RE = re.compile(r"⟦\s*P(\d+)\s*⟧")
+
+
+def _token(i: int) -> str:
+    return f"⟦P{i}⟧"
+
+
+def protect_spans(text: str):
+    """
+    Trả về (skeleton, spans): skeleton là text với mỗi span không dịch được thay bằng ⟦Pn⟧,
+    spans[n-1] là nội dung gốc. Không có gì để bảo vệ → (text, []).
+    """
+    text = text or ""
+    if "⟦" in text:
+        # văn bản gốc đã có ký tự placeholder → không an toàn để thay
+        return text, []
+    spans = []
+
+    def _sub(m):
+        spans.append(m.group(0))
+        return _token(len(spans))
+
+    skeleton = text
+    for pattern in _PATTERNS:
+        skeleton = pattern.sub(_sub, skeleton)
+    return skeleton, spans
+
+
+def has_prose(skeleton: str) -> bool:
+    """Còn chữ cái nào ngoài placeholder không (không còn → khỏi dịch)."""
+    return any(c.isalpha() for c in _TOKEN_RE.sub("", skeleton or ""))
+
+
+def restore_spans(translated: str, spans: list):
+    """
+    Thay ⟦Pn⟧ trong bản dịch bằng nội dung gốc. Trả về None nếu model làm mất / nhân đôi
+    placeholder (caller nên dịch lại nguyên văn).
+    """
+    if not spans:
+        return translated
+    found = [int(n) for n in _TOKEN_RE.findall(translated or "")]
+    if sorted(found) != list(range(1, len(spans) + 1)):
+        return None
+    return _TOKEN_RE.sub(lambda m: spans[int(m.group(1)) - 1], translated)
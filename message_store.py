@@ -0,0 +1,162 @@
+# message_store.py
+import sqlite3
+import threading
+import time
+
+from config_loader import MESSAGE_STORE_FILE
+
+# tiền tố mà từng provider gắn vào bản dịch (xem translate.py)
+_PROVIDER_PREFIX = (("🔁", "gemini"), ("🌐", "googletrans"), ("🆓", "libretranslate"))
+
+
+def provider_of(translated: str) -> str:
+    for prefix, name in _PROVIDER_PREFIX:
+        if (translated or "").startswith(prefix):
+            return name
+    return ""
+
+
+class MessageStore:
+    """
+    Lịch sử message dạng có cấu trúc (SQLite): message gốc + bản dịch theo từng ngôn ngữ.
+    Là nguồn dữ liệu cho view (khôi phục khi khởi động, phân trang khi cuộn) — HTML được
+    render lại khi cần, nên đổi ngôn ngữ / toggle không phải dịch lại.
+
+    Thứ tự message = thứ tự nhận (cột id tự tăng).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " key TEXT NOT NULL UNIQUE,"
+                " post_id TEXT,"
+                " channel_id TEXT,"
+                " channel TEXT,"
+                " user_id TEXT,"
+                " sender TEXT,"
+                " create_at INTEGER,"
+                " original TEXT NOT NULL,"
+                " css_class TEXT,"
+                " received_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " key TEXT NOT NULL,"
+                " lang TEXT NOT NULL,"
+                " translated TEXT NOT NULL,"
+                " provider TEXT,"
+                " latency_ms INTEGER,"
+                " created REAL NOT NULL,"
+                " PRIMARY KEY (key, lang))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel_id, create_at)")
+            # high-water mark mỗi kênh: post mới nhất đã nhận (để lấy bù post bị lỡ khi mất kết nối)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS channel_marks ("
+                " channel_id TEXT PRIMARY KEY,"
+                " create_at INTEGER NOT NULL,"
+                " post_id TEXT)"
+            )
+            self._db.commit()
+
+    def add_message(self, key, original, post_id="", channel_id="", channel="", user_id="",
+                    sender="", create_at=0, css_class="normal") -> bool:
+        """Lưu message gốc; key đã có thì bỏ qua (trả về False)."""
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO messages(key, post_id, channel_id, channel, user_id, sender,"
+                " create_at, original, css_class, received_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, post_id, channel_id, channel, user_id, sender, int(create_at or 0),
+                 original or "", css_class, time.time()),
+            )
+            self._db.commit()
+            return cur.rowcount > 0
+
+    def set_translation(self, key, lang, translated, provider=None, latency_ms=None):
+        if not translated:
+            return
+        if provider is None:
+            provider = provider_of(translated)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations(key, lang, translated, provider, latency_ms, created)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, lang, translated, provider,
+                 None if latency_ms is None else int(latency_ms), time.time()),
+            )
+            self._db.commit()
+
+    def set_mark(self, channel_id, create_at, post_id=""):
+        """Nâng high-water mark của kênh (không bao giờ lùi)."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO channel_marks(channel_id, create_at, post_id) VALUES (?, ?, ?)"
+                " ON CONFLICT(channel_id) DO UPDATE SET create_at = excluded.create_at,"
+                " post_id = excluded.post_id WHERE excluded.create_at > channel_marks.create_at",
+                (channel_id, int(create_at or 0), post_id or ""),
+            )
+            self._db.commit()
+
+    def marks(self) -> dict:
+        """channel_id -> create_at (ms) của post mới nhất đã nhận."""
+        with self._lock:
+            return {c: t for c, t in self._db.execute("SELECT channel_id, create_at FROM channel_marks")}
+
+    def get(self, key):
+        rows = self._select("WHERE key = ?", (key,), 1)
+        return rows[0] if rows else None
+
+    def recent(self, count=50):
+        """count message mới nhất, cũ -> mới."""
+        return list(reversed(self._select("", (), count, desc=True)))
+
+    def before(self, key, count=50):
+        """count message liền trước key, cũ -> mới. Không có key → []."""
+        rows = self._select("WHERE id < (SELECT id FROM messages WHERE key = ?)", (key,), count, desc=True)
+        return list(reversed(rows))
+
+    def after(self, key, count=50):
+        """count message liền sau key, cũ -> mới. Không có key → []."""
+        return self._select("WHERE id > (SELECT id FROM messages WHERE key = ?)", (key,), count)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def _select(self, where, params, limit, desc=False):
+        order = "DESC" if desc else "ASC"
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, key, post_id, channel_id, channel, user_id, sender, create_at, original,"
+                f" css_class, received_at FROM messages {where} ORDER BY id {order} LIMIT ?",
+                (*params, int(limit)),
+            ).fetchall()
+            keys = [r[1] for r in rows]
+            trans = {}
+            if keys:
+                marks = ",".join("?" * len(keys))
+                for key, lang, text in self._db.execute(
+                    f"SELECT key, lang, translated FROM translations WHERE key IN ({marks})", keys
+                ):
+                    trans.setdefault(key, {})[lang] = text
+        cols = ("id", "key", "post_id", "channel_id", "channel", "user_id", "sender", "create_at",
+                "original", "css_class", "received_at")
+        out = []
+        for r in rows:
+            d = dict(zip(cols, r))
+            d["translations"] = trans.get(d["key"], {})
+            out.append(d)
+        return out
+
+
+STORE = None
+if MESSAGE_STORE_FILE:
+    try:
+        STORE = MessageStore(MESSAGE_STORE_FILE)
+    except Exception:
+        STORE = None
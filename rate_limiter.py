@@ -0,0 +1,117 @@
+# rate_limiter.py
+import asyncio
+import threading
+import time
+
+
+class RateLimited(Exception):
+    """Hết quota phía client (hoặc server trả 429). retry_after = số giây nên chờ."""
+    def __init__(self, retry_after: float = 1.0, message: str = "rate limited"):
+        super().__init__(message)
+        self.retry_after = max(0.0, float(retry_after))
+
+
+class TokenBucket:
+    """Token bucket nạp đều rate_per_min token/phút, chứa tối đa capacity token."""
+    def __init__(self, rate_per_min: float, capacity: float = None):
+        self.rate = float(rate_per_min) / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_min)
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        """Số giây cần chờ để đủ n token (n lớn hơn capacity thì chờ đầy bucket)."""
+        self._refill(now)
+        need = min(float(n), self.capacity) - self.tokens
+        if need <= 0:
+            return 0.0
+        return need / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, n: float):
+        self.tokens -= min(float(n), self.capacity)
+
+    def drain(self):
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimiter:
+    """
+    Giới hạn song song requests/phút và tokens/phút (quota kiểu Gemini).
+    rpm / tpm <= 0 nghĩa là không giới hạn chiều đó.
+    """
+    def __init__(self, rpm: float, tpm: float):
+        self._req = TokenBucket(rpm) if rpm and rpm > 0 else None
+        self._tok = TokenBucket(tpm) if tpm and tpm > 0 else None
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        self.throttled = 0  # số lần phải chờ / bị từ chối vì hết quota
+
+    def _wait_time(self, tokens: float, now: float) -> float:
+        wait = max(0.0, self._blocked_until - now)
+        if self._req:
+            wait = max(wait, self._req.wait_time(1, now))
+        if self._tok:
+            wait = max(wait, self._tok.wait_time(tokens, now))
+        return wait
+
+    def headroom(self, tokens: float = 1, requests: float = 1) -> float:
+        """Số giây cần chờ để có đủ `requests` request + `tokens` token, KHÔNG lấy quota."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+            if self._req:
+                wait = max(wait, self._req.wait_time(requests, now))
+            if self._tok:
+                wait = max(wait, self._tok.wait_time(tokens, now))
+            return wait
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Lấy quota nếu có; trả về 0.0 nếu OK, ngược lại số giây cần chờ."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._wait_time(tokens, now)
+            if wait > 0:
+                return wait
+            if self._req:
+                self._req.take(1)
+            if self._tok:
+                self._tok.take(tokens)
+            return 0.0
+
+    def acquire(self, tokens: float = 1, timeout: float = 0.0):
+        """Chờ tối đa timeout giây để lấy quota; không được thì raise RateLimited."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self.throttled += 1
+                raise RateLimited(wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1, timeout: float = 0.0):
+        """Như acquire nhưng chờ bằng asyncio.sleep (không chiếm thread của event loop)."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self.throttled += 1
+                raise RateLimited(wait)
+            await asyncio.sleep(wait)
+
+    def backoff(self, seconds: float):
+        """Server báo 429: chặn mọi request trong `seconds` giây."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + max(0.0, seconds))
+            if self._req:
+                self._req.drain()
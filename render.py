@@ -0,0 +1,132 @@
+# render.py
+"""
+Render message → HTML fragment, dùng chung cho view (main_window) và log (html_log / log_writer).
+Markdown của mỗi đoạn text chỉ chạy 1 lần: kết quả được nhớ theo hash của text
+(bản gốc và bản dịch của cùng message, hay cùng 1 text ở view và log, đều trúng cache).
+
+Backend markdown chọn bằng key MARKDOWN_BACKEND trong config:
+  "markdown"    — Python-Markdown (mặc định, luôn có)
+  "markdown-it" — markdown-it-py (CommonMark + bảng), nhanh hơn nhiều
+  "mistune"     — mistune (+ plugin bảng), nhanh nhất
+Backend không cài được → tự quay về "markdown". So sánh tốc độ / độ khớp:
+test_item/bench_markdown.py.
+"""
+import hashlib
+import html as html_lib
+import re
+import threading
+from collections import OrderedDict
+
+from config_loader import MARKDOWN_BACKEND
+
+MD_EXTENSIONS = ["fenced_code", "tables"]
+MD_CACHE_SIZE = 2000
+
+
+# ---- backends: mỗi hàm trả về callable(text_đã_escape) -> html ----
+def _python_markdown():
+    from markdown import markdown
+    return lambda text: markdown(text, extensions=MD_EXTENSIONS)
+
+
+def _markdown_it():
+    from markdown_it import MarkdownIt
+    # commonmark đã có fenced code; html=False: không cho HTML thô (input cũng đã escape)
+    md = MarkdownIt("commonmark", {"html": False}).enable("table")
+    return md.render
+
+
+def _mistune():
+    import mistune
+    # escape=False: input đã được escape trước, tránh escape lần 2
+    return mistune.create_markdown(escape=False, plugins=["table"])
+
+
+BACKENDS = {
+    "markdown": _python_markdown,
+    "markdown-it": _markdown_it,
+    "mistune": _mistune,
+}
+
+
+def make_renderer(name: str):
+    """callable(text) -> html cho backend `name` (escape text trước khi render). Lỗi import → raise."""
+    to_html = BACKENDS[name]()
+    return lambda text: to_html(html_lib.escape(text))
+
+
+_md_cache = OrderedDict()   # sha1(text) -> html, LRU
+_md_lock = threading.Lock()  # dùng từ GUI thread lẫn thread ghi log
+_md_stats = {"hits": 0, "misses": 0}
+_backend = {"name": "", "render": None}
+
+
+def set_backend(name: str) -> str:
+    """Đổi backend markdown (xoá cache). Trả về tên backend thực sự được dùng."""
+    try:
+        fn = make_renderer(name)
+    except Exception:
+        name, fn = "markdown", make_renderer("markdown")
+    with _md_lock:
+        _backend.update(name=name, render=fn)
+        _md_cache.clear()
+    return name
+
+
+def backend_name() -> str:
+    return _backend["name"]
+
+
+def render_markdown(text: str) -> str:
+    """Escape + markdown (có nhớ kết quả). Text rỗng → ""."""
+    if not text:
+        return ""
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    with _md_lock:
+        cached = _md_cache.get(key)
+        if cached is not None:
+            _md_cache.move_to_end(key)
+            _md_stats["hits"] += 1
+            return cached
+        _md_stats["misses"] += 1
+    out = _backend["render"](text)
+    with _md_lock:
+        _md_cache[key] = out
+        while len(_md_cache) > MD_CACHE_SIZE:
+            _md_cache.popitem(last=False)
+    return out
+
+
+def render_stats() -> dict:
+    """Số hit/miss của cache markdown + backend đang dùng."""
+    with _md_lock:
+        return dict(_md_stats, entries=len(_md_cache), backend=_backend["name"])
+
+
+def entry_dom_id(msg_key: str) -> str:
+    return "m-" + re.sub(r"[^A-Za-z0-9_-]", "_", msg_key or "")
+
+
+def render_entry(msg_key, sender, channel, ts, message, translated="", css_class="normal") -> str:
+    """
+    Fragment <div class='msg'> của 1 message (id + data-key theo msg_key nếu có).
+    Luôn có cả bản gốc lẫn bản dịch; ẩn/hiện do class hide-* của .container quyết định.
+    """
+    display_html = f"<div class='content'>{render_markdown(message)}</div>"
+    if translated:
+        display_html += f"<div class='translated'>{render_markdown(translated)}</div>"
+
+    attrs = ""
+    if msg_key:
+        attrs = f" id='{entry_dom_id(msg_key)}' data-key='{html_lib.escape(msg_key)}'"
+    return (
+        f"<div class='msg {'mention' if css_class == 'mention' else ''}'{attrs}>"
+        f"<div class='timestamp'>[{html_lib.escape(ts or '')}]</div>"
+        f"<div><span class='sender'>{html_lib.escape(sender or '')}</span> "
+        f"in <span class='channel'>{html_lib.escape(channel or '')}</span></div>"
+        f"{display_html}"
+        f"</div>\n"
+    )
+
+
+set_backend(MARKDOWN_BACKEND)
@@ -2,11 +2,23 @@
 from PyQt6.QtCore import QObject, pyqtSignal
 
 class Signals(QObject):
-    # sender, channel, original_message, translated_message
-    new_message = pyqtSignal(str, str, str, str)
+    # sender, channel, original_message, translated_message, msg_key
+    # (translated_message thường rỗng; bản dịch đến sau qua message_translated)
+    new_message = pyqtSignal(str, str, str, str, str)
+
+    # msg_key, target_lang, translated_message ("" nếu không dịch được)
+    # Lần phát đầu tiên cho mỗi msg_key luôn là ngôn ngữ đích hiện tại;
+    # chế độ TRANSLATE_ALL_LANGS phát tiếp các ngôn ngữ còn lại sau đó.
+    message_translated = pyqtSignal(str, str, str)
 
     # connection status
     set_connected = pyqtSignal(bool)
+    # connection metrics (dict): reconnects, last_detect_sec, last_recover_sec, attempt, retry_in
+    connection_stats = pyqtSignal(dict)
+
+    # trang lịch sử đọc ở thread nền cho virtualization của view (MainWindow._load_history):
+    # kind ("older" | "newer"), key, generation, store rows, log entries [(key, html)]
+    history_loaded = pyqtSignal(str, str, int, list, list)
 
     # unread / total messages counter
     update_count = pyqtSignal(int)
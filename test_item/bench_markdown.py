@@ -0,0 +1,111 @@
+# bench_markdown.py
+# So sánh các backend markdown của render.py trên tập post giống Mattermost:
+#   - tốc độ (post/giây, không dùng cache của render.py)
+#   - độ khớp output so với Python-Markdown (sau khi chuẩn hoá khoảng trắng giữa thẻ)
+#
+# Chạy từ thư mục gốc repo:  python test_item/bench_markdown.py [số vòng]
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import BACKENDS, make_renderer  # noqa: E402
+
+
+def header(t):
+    print("\n" + "=" * 60)
+    print(t)
+    print("=" * 60)
+
+
+CODE_BLOCK = "```python\n" + "\n".join(
+    f"def handler_{i}(event, ctx):\n    if event['id'] < {i} and ctx & 0x{i:02x}:\n"
+    f"        return {{'status': 'ok', 'n': {i}}}\n"
+    for i in range(40)
+) + "```"
+
+TABLE = "| service | p50 (ms) | p99 (ms) | status |\n|---|---|---|---|\n" + "\n".join(
+    f"| api-{i} | {10 + i} | {120 + 7 * i} | `OK` |" for i in range(15)
+)
+
+NESTED_LIST = (
+    "Checklist cho release:\n\n"
+    "- Backend\n    - migrate DB\n    - restart worker\n        - worker-1\n        - worker-2\n"
+    "- Frontend\n    - build bundle\n    - purge CDN\n- QA sign-off\n"
+)
+
+CORPUS = {
+    "short chat": [
+        "ok anh", "LGTM :+1:", "@long.pham check giúp em PR này nhé",
+        "Deploy xong rồi, mọi người test lại giúp em **staging** nha",
+        "meeting dời sang 3h chiều, link: https://meet.example.com/abc-defg-hij",
+    ],
+    "code block": [
+        "Log lỗi trên prod:\n\n" + CODE_BLOCK,
+        "Sửa thế này được không?\n\n```\nSELECT * FROM users WHERE id < 10 AND flag & 4;\n```\nhay dùng `JOIN`?",
+    ],
+    "table": [
+        "Kết quả load test hôm qua:\n\n" + TABLE,
+    ],
+    "nested list": [
+        NESTED_LIST,
+        "1. Pull code\n2. Chạy `make test`\n    1. unit\n    2. integration\n3. Tạo PR",
+    ],
+    "mixed": [
+        "## Incident 2025-09-19\n\n**Impact**: 12% request lỗi <5xx> trong 7 phút.\n\n"
+        + NESTED_LIST + "\n" + TABLE + "\n\nStack trace:\n\n" + CODE_BLOCK[:600] + "\n```\n\n> cc @channel",
+    ],
+}
+
+
+_TAG_WS_RE = re.compile(r">\s+<")
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize(html: str) -> str:
+    return _WS_RE.sub(" ", _TAG_WS_RE.sub("><", html)).strip()
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    posts = [(cat, p) for cat, items in CORPUS.items() for p in items]
+
+    renderers = {}
+    for name in BACKENDS:
+        try:
+            renderers[name] = make_renderer(name)
+        except Exception as e:
+            print(f"⚠️  bỏ qua backend {name}: {type(e).__name__} {e}")
+
+    header(f"1) Tốc độ ({len(posts)} post x {rounds} vòng)")
+    base = None
+    for name, fn in renderers.items():
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for _, p in posts:
+                fn(p)
+        dt = time.perf_counter() - t0
+        rate = len(posts) * rounds / dt
+        base = base or rate
+        print(f"{name:12s} {rate:10.0f} post/s   x{rate / base:5.1f} so với {next(iter(renderers))}")
+
+    header("2) Độ khớp output so với Python-Markdown")
+    ref = renderers.get("markdown")
+    if ref is None:
+        print("Không có Python-Markdown để so sánh")
+        return
+    for name, fn in renderers.items():
+        if name == "markdown":
+            continue
+        diff = {}
+        for cat, p in posts:
+            if normalize(fn(p)) != normalize(ref(p)):
+                diff[cat] = diff.get(cat, 0) + 1
+        same = len(posts) - sum(diff.values())
+        print(f"{name:12s} khớp {same}/{len(posts)}" + (f"   khác: {diff}" if diff else ""))
+
+
+if __name__ == "__main__":
+    main()
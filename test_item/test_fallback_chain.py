@@ -22,6 +22,10 @@ os.environ.setdefault("TRANSLATE_DEBUG", "true")
 SAMPLE_TEXT = "hello world"
 TARGET = "vi"
 
+# Tắt cache bản dịch: kết quả Gemini ở bước 1 được cache, bước 2/3 sẽ trả lại bản 🔁 đó
+# thay vì đi qua chuỗi fallback đang được giả lập
+translate._CACHE = None
+
 header("1) Gọi bình thường (nếu Gemini hoạt động sẽ thấy prefix 🔁 )")
 try:
     out = translate.translate_with_fallback(SAMPLE_TEXT, TARGET)
@@ -0,0 +1,48 @@
+# test_lang_detect.py
+# Kiểm tra nhận diện ngôn ngữ cục bộ (lang_detect.py), nhất là message trộn nhiều ngôn ngữ:
+# message bị coi là "đã ở ngôn ngữ đích" (độ tin cậy >= LANG_DETECT_MIN_CONFIDENCE) sẽ KHÔNG được dịch.
+#
+# Chạy từ thư mục gốc repo:  python test_item/test_lang_detect.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang_detect import detect_language  # noqa: E402
+
+MIN_CONFIDENCE = 0.85  # mặc định của LANG_DETECT_MIN_CONFIDENCE
+
+
+def header(t):
+    print("\n" + "=" * 60)
+    print(t)
+    print("=" * 60)
+
+
+# (text, ngôn ngữ phải được bỏ qua khi dịch sang nó, hoặc None = không được bỏ qua sang vi)
+CASES = [
+    ("Please review the new build before release today, cảm ơn", None),
+    ("Thanks team, the deploy is done. Cảm ơn mọi người!", None),
+    ("ok anh, em sẽ kiểm tra lại bản build trước khi release nhé", "vi"),
+    ("deploy xong rồi nhưng test vẫn còn lỗi trên server staging", "vi"),
+    ("Anh xem giúp em lỗi này nhé:\n```\nTraceback (most recent call last): the file is not found\n```", "vi"),
+    ("Cảm ơn anh đã sửa nhanh, bây giờ chạy được rồi", "vi"),
+    ("hi team, please check the build before the release, thanks", "en"),
+    ("tolong cek build sebelum rilis ya, terima kasih", "id"),
+    ("デプロイは終わりましたか？確認お願いします", "ja"),
+]
+
+header("detect_language: message trộn ngôn ngữ")
+failures = 0
+for text, want in CASES:
+    lang, confidence = detect_language(text)
+    skipped = lang if confidence >= MIN_CONFIDENCE else None
+    ok = (skipped == want) if want else (skipped != "vi")
+    failures += 0 if ok else 1
+    label = text.replace("\n", " ")[:60]
+    print(f"{'✅' if ok else '❌'} {label!r} → ({lang!r}, {confidence:.2f})"
+          + ("" if ok else f"  (muốn: {want or 'không phải vi'})"))
+
+header("Kết quả")
+print("✅ Tất cả OK" if not failures else f"❌ {failures} kiểm tra lỗi")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,104 @@
+# test_ws_events.py
+# Kiểm tra lọc nhanh của ws_events.py (peek_frame / decode_post) trên frame Mattermost ghi lại.
+# Lọc nhanh dựa vào bố cục frame của server:
+#   - "seq" là key cuối của frame (event, data, broadcast, seq);
+#   - key "channel_id" không escape đầu tiên là của broadcast (post trong data.post là chuỗi đã escape).
+# Server đổi bố cục → script này báo ❌.
+#
+# Chạy từ thư mục gốc repo:  python test_item/test_ws_events.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_events import BACKENDS, decode_post, decode_stats, peek_frame, set_backend  # noqa: E402
+
+
+def header(t):
+    print("\n" + "=" * 60)
+    print(t)
+    print("=" * 60)
+
+
+WATCHED = "4xp9fdt77pncbef59f4k1qe83o"
+OTHER = "ih3t7tr6f3fmpb9bbm9t3kmomc"
+
+# frame ghi lại từ Mattermost 9.x (rút gọn data, giữ nguyên thứ tự key)
+POSTED = (
+    '{"event":"posted","data":{"channel_display_name":"Town Square","channel_name":"town-square",'
+    '"channel_type":"O","mentions":"[\\"9s4ktkt3bjdt3yzmyqfxcnyqxa\\"]","post":"{\\"id\\":\\"k3h8z6xsb3r5jx7mq8utgyqf1w\\",'
+    '\\"create_at\\":1718000000123,\\"update_at\\":1718000000123,\\"edit_at\\":0,\\"delete_at\\":0,'
+    '\\"is_pinned\\":false,\\"user_id\\":\\"9s4ktkt3bjdt3yzmyqfxcnyqxa\\",\\"channel_id\\":\\"' + WATCHED + '\\",'
+    '\\"root_id\\":\\"\\",\\"original_id\\":\\"\\",\\"message\\":\\"deploy xong \\\\\\"api\\\\\\" chưa?\\",'
+    '\\"type\\":\\"\\",\\"props\\":{},\\"hashtags\\":\\"\\",\\"pending_post_id\\":\\"\\",\\"reply_count\\":0,'
+    '\\"metadata\\":{}}","sender_name":"@long","set_online":true,"team_id":"m4h8g9r3jtdhbxk5xqz1q6t7yh"},'
+    '"broadcast":{"omit_users":null,"user_id":"","channel_id":"' + WATCHED + '","team_id":"",'
+    '"connection_id":"","omit_connection_id":""},"seq":42}'
+)
+POSTED_OTHER = POSTED.replace(WATCHED, OTHER)
+# post ở kênh khác nhưng broadcast lại là kênh đang theo dõi: lọc nhanh cho qua, decode phải chặn
+POSTED_MISMATCH = POSTED.replace('\\"channel_id\\":\\"' + WATCHED, '\\"channel_id\\":\\"' + OTHER)
+TYPING = (
+    '{"event":"typing","data":{"parent_id":"","user_id":"9s4ktkt3bjdt3yzmyqfxcnyqxa"},'
+    '"broadcast":{"omit_users":{"9s4ktkt3bjdt3yzmyqfxcnyqxa":true},"user_id":"","channel_id":"' + WATCHED + '",'
+    '"team_id":"","connection_id":"","omit_connection_id":""},"seq":43}'
+)
+HELLO = (
+    '{"event":"hello","data":{"connection_id":"ufcn8o7d1jbh9qtmhygb7bm4nr","server_version":"9.5.0.9.5.0.abc.false"},'
+    '"broadcast":{"omit_users":null,"user_id":"9s4ktkt3bjdt3yzmyqfxcnyqxa","channel_id":"","team_id":"",'
+    '"connection_id":"","omit_connection_id":""},"seq":0}'
+)
+SEQ_REPLY = '{"status":"OK","seq_reply":1}'
+
+failures = 0
+
+
+def check(name, got, want):
+    global failures
+    ok = got == want
+    failures += 0 if ok else 1
+    print(("✅ " if ok else "❌ ") + name + ("" if ok else f"\n     got:  {got!r}\n     want: {want!r}"))
+
+
+def run_backend(name):
+    header(f"backend: {name}")
+
+    check("peek posted", peek_frame(POSTED), ("posted", 42))
+    check("peek typing", peek_frame(TYPING), ("typing", 43))
+    check("peek hello", peek_frame(HELLO), ("hello", 0))
+    check("peek seq_reply", peek_frame(SEQ_REPLY), (None, None))
+    check("peek posted + newline", peek_frame(POSTED + "\n"), ("posted", 42))
+
+    watch = {WATCHED}
+    post = decode_post(POSTED, watch, event="posted")
+    check("posted: id", (post or {}).get("id"), "k3h8z6xsb3r5jx7mq8utgyqf1w")
+    check("posted: channel_id", (post or {}).get("channel_id"), WATCHED)
+    check("posted: message", (post or {}).get("message"), 'deploy xong "api" chưa?')
+    check("posted: không truyền event", (decode_post(POSTED, watch) or {}).get("id"), "k3h8z6xsb3r5jx7mq8utgyqf1w")
+
+    before = decode_stats()
+    check("posted kênh khác → None", decode_post(POSTED_OTHER, watch, event="posted"), None)
+    check("  ... bị lọc nhanh (không decode)",
+          decode_stats()["skipped_channel"] - before["skipped_channel"], 1)
+
+    before = decode_stats()
+    check("typing → None", decode_post(TYPING, watch, event="typing"), None)
+    check("hello → None", decode_post(HELLO, watch, event="hello"), None)
+    check("  ... bị lọc nhanh theo event",
+          decode_stats()["skipped_event"] - before["skipped_event"], 2)
+
+    check("seq_reply → None", decode_post(SEQ_REPLY, watch), None)
+    check("post lệch kênh broadcast → None", decode_post(POSTED_MISMATCH, watch, event="posted"), None)
+    check("frame hỏng → None", decode_post(POSTED[:-5], watch, event="posted"), None)
+
+
+for backend in BACKENDS:
+    used = set_backend(backend)
+    if used != backend:
+        print(f"\n(bỏ qua backend {backend}: chưa cài)")
+        continue
+    run_backend(backend)
+
+header("Kết quả")
+print("✅ Tất cả OK" if not failures else f"❌ {failures} kiểm tra lỗi")
+sys.exit(1 if failures else 0)
@@ -1,14 +1,72 @@
 # translate.py
 import os
 import re
-import requests
-from config_loader import API_KEY, GEMINI_URL
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config_loader import (
+    API_KEY, GEMINI_URL,
+    TRANSLATE_CACHE_FILE, TRANSLATE_CACHE_TTL_DAYS, TRANSLATE_CACHE_MAX_ENTRIES,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SEC,
+    HEDGE_PERCENTILE, HEDGE_MIN_DELAY_SEC, HEDGE_DEFAULT_DELAY_SEC,
+    BATCH_MAX_ITEMS, BATCH_MAX_CHARS, HTTP_POOL_SIZE,
+    GEMINI_RPM, GEMINI_TPM, RATE_LIMIT_MAX_WAIT_SEC,
+    LANG_DETECT_ENABLED, LANG_DETECT_MIN_CONFIDENCE
+)
+from translate_cache import TranslationCache
+from circuit_breaker import CircuitBreaker
+from http_transport import ProviderTransport
+from rate_limiter import RateLimiter, RateLimited
+from lang_detect import detect_language
+from md_segments import protect_spans, restore_spans, has_prose
 
 # ======= Fallback config (có thể override bằng ENV) =======
 FREE_TRANSLATE_URL = os.environ.get("FREE_TRANSLATE_URL", "https://libretranslate.de/translate")
 FREE_TRANSLATE_API_KEY = os.environ.get("FREE_TRANSLATE_API_KEY", None)
 FREE_TRANSLATE_TIMEOUT = float(os.environ.get("FREE_TRANSLATE_TIMEOUT", "12"))
 
+# ======= Độ ưu tiên (số nhỏ = gấp hơn) =======
+PRIORITY_PERSONAL = 0   # @mention cá nhân
+PRIORITY_CHANNEL = 1    # @channel / @here / @all
+PRIORITY_NORMAL = 2     # chat thường: hết quota Gemini thì hoãn, không rơi xuống provider kém hơn
+
+
+class TranslationDeferred(Exception):
+    """Message ưu tiên thấp gặp lúc hết quota Gemini → caller nên thử lại sau retry_after giây."""
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__(f"translation deferred for {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+# ======= Rate limit phía client cho Gemini (requests/phút + tokens/phút) =======
+GEMINI_LIMITER = RateLimiter(GEMINI_RPM, GEMINI_TPM)
+
+
+def _estimate_tokens(prompt_text: str) -> int:
+    # ~4 ký tự / token cho input, output ước lượng bằng input
+    return max(1, len(prompt_text) // 2)
+
+
+# ======= HTTP: session keep-alive riêng cho từng provider =======
+_HTTP = {
+    "gemini": ProviderTransport("gemini", pool_size=HTTP_POOL_SIZE),
+    "libretranslate": ProviderTransport("libretranslate", pool_size=HTTP_POOL_SIZE),
+}
+
+
+def prewarm_connections():
+    """Mở sẵn kết nối tới các provider (chạy nền) — gọi 1 lần lúc khởi động."""
+    if API_KEY and GEMINI_URL:
+        _HTTP["gemini"].prewarm(GEMINI_URL)
+    if FREE_TRANSLATE_URL:
+        _HTTP["libretranslate"].prewarm(FREE_TRANSLATE_URL)
+
+
+def transport_stats() -> dict:
+    """Số đo thời gian request (total/TTFB, kết nối mới vs tái sử dụng) theo provider."""
+    return {name: t.stats() for name, t in _HTTP.items()}
+
 # Thử import googletrans (không bắt buộc)
 _HAVE_GOOGLETRANS = False
 try:
@@ -34,8 +92,116 @@ _LANG_NAME = {
 def _norm_lang(code: str) -> str:
     return _LANG_MAP.get((code or "vi").lower(), "vi")
 
+# tất cả ngôn ngữ đích app hỗ trợ (chế độ dịch sẵn mọi ngôn ngữ)
+ALL_LANGS = tuple(_LANG_MAP)
+
+
+# ======= Cache bản dịch =======
+# Tăng PROMPT_VERSION khi đổi prompt / provider để không dùng lại bản dịch cũ
+PROMPT_VERSION = "v2"
+# Bản dịch từ tầng fallback chỉ giữ ngắn hạn để còn cơ hội lấy bản Gemini
+FALLBACK_CACHE_TTL_SEC = 3600
+
+_CACHE = None
+if TRANSLATE_CACHE_FILE:
+    try:
+        _CACHE = TranslationCache(
+            TRANSLATE_CACHE_FILE,
+            ttl_sec=TRANSLATE_CACHE_TTL_DAYS * 86400,
+            max_entries=TRANSLATE_CACHE_MAX_ENTRIES,
+        )
+    except Exception:
+        _CACHE = None
+
+
+def cache_stats() -> dict:
+    """Số hit/miss của cache bản dịch (rỗng nếu cache bị tắt)."""
+    if _CACHE is None:
+        return {}
+    try:
+        return _CACHE.stats()
+    except Exception:
+        return {}
+
+
+# ======= Bỏ qua message đã ở sẵn ngôn ngữ đích (nhận diện cục bộ) =======
+_LANG_STATS = {"checked": 0, "skipped": 0}
+_LANG_STATS_LOCK = threading.Lock()
+
+
+def lang_detect_stats() -> dict:
+    """Số message đã kiểm tra ngôn ngữ / số lần bỏ qua gọi dịch vì đã đúng ngôn ngữ đích."""
+    with _LANG_STATS_LOCK:
+        return dict(_LANG_STATS)
+
+
+def _source_language(text: str):
+    """Ngôn ngữ gốc của message nếu nhận diện đủ chắc, không thì None. Gọi 1 lần / message."""
+    if not LANG_DETECT_ENABLED:
+        return None
+    try:
+        lang, confidence = detect_language(text)
+    except Exception:
+        return None
+    with _LANG_STATS_LOCK:
+        _LANG_STATS["checked"] += 1
+    return lang if confidence >= LANG_DETECT_MIN_CONFIDENCE else None
+
+
+def _same_language(source, tgt: str) -> bool:
+    """So ngôn ngữ gốc (đã nhận diện) với 1 ngôn ngữ đích; trùng = bỏ qua 1 lần gọi dịch."""
+    skip = source is not None and source == tgt
+    if skip:
+        with _LANG_STATS_LOCK:
+            _LANG_STATS["skipped"] += 1
+    return skip
+
+
+def _already_in_target(text: str, tgt: str) -> bool:
+    return _same_language(_source_language(text), tgt)
+
+
+def _cache_get(text: str, tgt: str):
+    if _CACHE is None:
+        return None
+    try:
+        return _CACHE.get(text, tgt, PROMPT_VERSION)
+    except Exception:
+        return None
+
+
+def _cache_put(text: str, tgt: str, translated: str, provider: str):
+    if _CACHE is None:
+        return
+    ttl = None if provider == "gemini" else FALLBACK_CACHE_TTL_SEC
+    try:
+        _CACHE.put(text, tgt, PROMPT_VERSION, translated, provider=provider, ttl_sec=ttl)
+    except Exception:
+        pass
+
+
+def cache_lookup(text: str, target_language: str):
+    """
+    Kiểm tra trước khi gọi provider → (mã ngôn ngữ đích, kết quả):
+    kết quả "" = không cần dịch (rỗng / đã ở sẵn ngôn ngữ đích), chuỗi = bản dịch trong cache,
+    None = phải dịch. Có truy vấn SQLite: bản async chạy hàm này ngoài event loop.
+    """
+    text = text or ""
+    tgt = _norm_lang(target_language)
+    if not text.strip() or _already_in_target(text, tgt):
+        return tgt, ""
+    return tgt, _cache_get(text, tgt)
+
+
+def cache_store(text: str, tgt: str, translated: str, provider: str):
+    """Lưu bản dịch vào cache (bản fallback chỉ giữ FALLBACK_CACHE_TTL_SEC)."""
+    _cache_put(text, tgt, translated, provider)
+
 
 # ======= Helpers =======
+# code / URL / @mention được thay bằng ⟦Pn⟧ trước khi gửi (xem md_segments.py)
+_PLACEHOLDER_RULE = "Tokens like ⟦P1⟧ are placeholders: copy each one unchanged and exactly once. "
+
 def _build_translate_prompt(tgt_name: str, text: str) -> str:
     """
     Prompt: dịch sang {tgt_name}, không giải thích; nếu input là Markdown thì giữ NGUYÊN định dạng.
@@ -43,12 +209,53 @@ def _build_translate_prompt(tgt_name: str, text: str) -> str:
     return (
         f"Translate the text below into {tgt_name}. Do not add any explanations or extra words. "
         "If the input contains Markdown, preserve its formatting EXACTLY as-is (headings, lists, bold/italic, code blocks, tables, inline code, links, spacing, and line breaks). "
+        f"{_PLACEHOLDER_RULE}"
         f"If the input is not Markdown, output clear {tgt_name} with appropriate punctuation and line breaks.\n\n"
         "INPUT:\n"
         f"{text}\n\n"
         f"OUTPUT ({tgt_name} only):"
     )
 
+_SEGMENT_RE = re.compile(r"<<<SEG (\d+)>>>\n?(.*?)\n?<<<END \1>>>", re.DOTALL)
+
+def _build_batch_prompt(tgt_name: str, texts: list) -> str:
+    """
+    Prompt dịch nhiều message cùng lúc; mỗi message bọc trong <<<SEG n>>> ... <<<END n>>>.
+    """
+    body = "\n".join(
+        f"<<<SEG {i}>>>\n{t}\n<<<END {i}>>>" for i, t in enumerate(texts, start=1)
+    )
+    return (
+        f"Translate each segment below into {tgt_name}. Do not add any explanations or extra words. "
+        "Each segment starts with a line <<<SEG n>>> and ends with a line <<<END n>>>. "
+        "Return EVERY segment, in the same order, wrapped in the same marker lines with the same n, "
+        "containing only its translation. Never merge, split or drop segments. "
+        "If a segment contains Markdown, preserve its formatting EXACTLY as-is (headings, lists, bold/italic, code blocks, tables, inline code, links, spacing, and line breaks). "
+        f"{_PLACEHOLDER_RULE}\n\n"
+        "INPUT:\n"
+        f"{body}\n\n"
+        f"OUTPUT ({tgt_name} only, same markers):"
+    )
+
+_LANG_BLOCK_RE = re.compile(r"<<<LANG (\w+)>>>\n?(.*?)\n?<<<END \1>>>", re.DOTALL)
+
+def _build_multi_prompt(text: str, langs: list) -> str:
+    """
+    Prompt dịch 1 message sang nhiều ngôn ngữ; mỗi bản dịch bọc trong <<<LANG xx>>> ... <<<END xx>>>.
+    """
+    targets = ", ".join(f"{_LANG_NAME[c]} ({c})" for c in langs)
+    return (
+        f"Translate the text below into each of these languages: {targets}. "
+        "Do not add any explanations or extra words. "
+        "For each language output one block that starts with a line <<<LANG code>>> and ends with a line <<<END code>>>, "
+        "using the language codes given above, containing only the translation. "
+        "If the input contains Markdown, preserve its formatting EXACTLY as-is (headings, lists, bold/italic, code blocks, tables, inline code, links, spacing, and line breaks). "
+        f"{_PLACEHOLDER_RULE}\n\n"
+        "INPUT:\n"
+        f"{text}\n\n"
+        "OUTPUT (one block per language):"
+    )
+
 def _strip_fences(s: str) -> str:
     """Nếu output được bao bằng ```...```, bỏ hàng rào để tránh render dư."""
     s = s.strip()
@@ -91,21 +298,42 @@ def _repair_markdown_structure(src: str, out: str) -> str:
 
 
 # ========== Primary: Gemini ==========
-def call_gemini_translate(text: str, target_language: str = "vi") -> str:
-    """
-    Dịch bằng Gemini. Nếu thành công → trả về có prefix '🔁 '.
-    Nếu lỗi → trả về '[Lỗi dịch]' (nội bộ), translate_with_fallback sẽ KHÔNG hiển thị chuỗi này.
-    """
-    if not API_KEY or not GEMINI_URL:
-        return "[Translate ERROR]"
+# Phần không phụ thuộc HTTP client, dùng chung với bản aiohttp trong translate_async.py
+GEMINI_TIMEOUT_SEC = 15
 
-    tgt_code = _norm_lang(target_language)
-    tgt_name = _LANG_NAME.get(tgt_code, "Vietnamese")
 
-    prompt_text = _build_translate_prompt(tgt_name, text)
+def gemini_enabled() -> bool:
+    return bool(API_KEY and GEMINI_URL)
 
-    headers = {"Content-Type": "application/json", "X-goog-api-key": API_KEY}
-    payload = {
+
+def gemini_headers() -> dict:
+    return {"Content-Type": "application/json", "X-goog-api-key": API_KEY}
+
+
+def gemini_wait_budget(priority: int) -> float:
+    """Số giây được chờ quota: chat thường không chờ, mention chờ tối đa RATE_LIMIT_MAX_WAIT_SEC."""
+    return 0.0 if priority >= PRIORITY_NORMAL else RATE_LIMIT_MAX_WAIT_SEC
+
+
+def gemini_rate_limited(status: int, headers):
+    """HTTP 429 → chặn limiter theo Retry-After, trả về RateLimited để caller raise; khác → None."""
+    if status != 429:
+        return None
+    try:
+        delay = float(headers.get("Retry-After", ""))
+    except Exception:
+        delay = 10.0
+    GEMINI_LIMITER.backoff(delay)
+    return RateLimited(delay, "Gemini 429")
+
+
+def gemini_text(data: dict) -> str:
+    """Text thô của candidate đầu tiên trong response generateContent."""
+    return data["candidates"][0]["content"]["parts"][0]["text"].strip()
+
+
+def _gemini_payload(prompt_text: str) -> dict:
+    return {
         "contents": [
             {"role": "user", "parts": [{"text": prompt_text}]}
         ],
@@ -116,35 +344,135 @@ def call_gemini_translate(text: str, target_language: str = "vi") -> str:
             "response_mime_type": "text/markdown"
         }
     }
+
+
+def gemini_attempts(prompt_text: str):
+    """
+    (số token ước lượng, các payload gửi lần lượt): lần đầu lỗi → thử lại 1 lần
+    không kèm generationConfig. Hết quota (client hoặc 429) thì không thử lại.
+    """
+    payload = _gemini_payload(prompt_text)
+    bare = {k: v for k, v in payload.items() if k != "generationConfig"}
+    return _estimate_tokens(prompt_text), [payload, bare]
+
+
+def gemini_translate_prompt(text: str, target_language: str = "vi") -> str:
+    tgt_name = _LANG_NAME.get(_norm_lang(target_language), "Vietnamese")
+    return _build_translate_prompt(tgt_name, text)
+
+
+def gemini_translate_output(text: str, raw: str) -> str:
+    """Text thô Gemini trả về → bản dịch hiển thị (prefix '🔁 ')."""
+    return "🔁 " + _repair_markdown_structure(text, _strip_fences(raw))
+
+
+def _gemini_post(payload: dict, tokens: int, priority: int) -> str:
+    GEMINI_LIMITER.acquire(tokens, timeout=gemini_wait_budget(priority))
+    resp = _HTTP["gemini"].post(GEMINI_URL, headers=gemini_headers(), json=payload,
+                                timeout=GEMINI_TIMEOUT_SEC)
+    limited = gemini_rate_limited(resp.status_code, resp.headers)
+    if limited:
+        raise limited
+    resp.raise_for_status()
+    return gemini_text(resp.json())
+
+
+def _gemini_generate(prompt_text: str, priority: int = PRIORITY_NORMAL) -> str:
+    """
+    Gửi 1 prompt tới Gemini, trả về text thô của candidate đầu tiên.
+    Lỗi lần đầu → thử lại 1 lần không kèm generationConfig; vẫn lỗi thì raise.
+    Hết quota (client hoặc 429) → raise RateLimited, không thử lại.
+    """
+    tokens, payloads = gemini_attempts(prompt_text)
+    for i, payload in enumerate(payloads):
+        try:
+            return _gemini_post(payload, tokens, priority)
+        except RateLimited:
+            raise
+        except Exception:
+            if i == len(payloads) - 1:
+                raise
+
+
+def call_gemini_translate(text: str, target_language: str = "vi", priority: int = PRIORITY_NORMAL) -> str:
+    """
+    Dịch bằng Gemini. Nếu thành công → trả về có prefix '🔁 '.
+    Nếu lỗi → trả về '[Lỗi dịch]' (nội bộ), translate_with_fallback sẽ KHÔNG hiển thị chuỗi này.
+    Hết quota → raise RateLimited để caller quyết định chờ / hoãn / fallback.
+    """
+    if not gemini_enabled():
+        return "[Translate ERROR]"
+
     try:
-        resp = requests.post(GEMINI_URL, headers=headers, json=payload, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-        out = data["candidates"][0]["content"]["parts"][0]["text"].strip()
-        out = _strip_fences(out)
-        out = _repair_markdown_structure(text, out)
+        out = _gemini_generate(gemini_translate_prompt(text, target_language), priority)
 
         # Nếu output giống hệt input -> coi như lỗi để fallback
         #if out.replace(" ", "").replace("\n", "") == text.replace(" ", "").replace("\n", ""):
          #   return "[Lỗi dịch]"
 
-        return "🔁 " + out
+        return gemini_translate_output(text, out)
+    except RateLimited:
+        raise
+    except Exception as e:
+        return f"[Translate ERROR] {e}"
+
+
+def call_gemini_translate_batch(texts: list, target_language: str = "vi", priority: int = PRIORITY_NORMAL):
+    """
+    Dịch nhiều message trong 1 request Gemini (mỗi message là 1 segment có ID).
+    Trả về list cùng độ dài với prefix '🔁 ', hoặc None nếu lỗi / số segment trả về
+    không khớp (caller sẽ fallback dịch từng message). Hết quota → raise RateLimited.
+    """
+    if not API_KEY or not GEMINI_URL or not texts:
+        return None
+
+    tgt_code = _norm_lang(target_language)
+    tgt_name = _LANG_NAME.get(tgt_code, "Vietnamese")
+
+    try:
+        raw = _gemini_generate(_build_batch_prompt(tgt_name, texts), priority)
+    except RateLimited:
+        raise
     except Exception:
-        try:
-            payload.pop("generationConfig", None)
-            resp = requests.post(GEMINI_URL, headers=headers, json=payload, timeout=15)
-            resp.raise_for_status()
-            data = resp.json()
-            out = data["candidates"][0]["content"]["parts"][0]["text"].strip()
-            out = _strip_fences(out)
-            out = _repair_markdown_structure(text, out)
+        return None
 
-            #if out.replace(" ", "").replace("\n", "") == text.replace(" ", "").replace("\n", ""):
-             #   return "[Lỗi dịch]"
+    segments = {}
+    for m in _SEGMENT_RE.finditer(raw):
+        segments[int(m.group(1))] = m.group(2)
+    if sorted(segments) != list(range(1, len(texts) + 1)):
+        return None
 
-            return "🔁 " + out
-        except Exception as e:
-             return f"[Translate ERROR] {e}"
+    results = []
+    for i, src in enumerate(texts, start=1):
+        out = _strip_fences(segments[i].strip())
+        if not out:
+            return None
+        results.append("🔁 " + _repair_markdown_structure(src, out))
+    return results
+
+
+def call_gemini_translate_multi(text: str, langs: list, priority: int = PRIORITY_NORMAL):
+    """
+    Dịch 1 message sang nhiều ngôn ngữ trong 1 request Gemini.
+    Trả về {lang: '🔁 ...'} hoặc None nếu lỗi / thiếu ngôn ngữ. Hết quota → raise RateLimited.
+    """
+    if not API_KEY or not GEMINI_URL or not langs:
+        return None
+    try:
+        raw = _gemini_generate(_build_multi_prompt(text, langs), priority)
+    except RateLimited:
+        raise
+    except Exception:
+        return None
+
+    blocks = {m.group(1).lower(): m.group(2) for m in _LANG_BLOCK_RE.finditer(raw)}
+    results = {}
+    for lang in langs:
+        out = _strip_fences((blocks.get(lang) or "").strip())
+        if not out:
+            return None
+        results[lang] = "🔁 " + _repair_markdown_structure(text, out)
+    return results
 
 
 # ========== Secondary: googletrans ==========
@@ -173,7 +501,7 @@ def _call_libretranslate(text: str, target_language: str) -> str:
     if FREE_TRANSLATE_API_KEY:
         payload["api_key"] = FREE_TRANSLATE_API_KEY
 
-    r = requests.post(FREE_TRANSLATE_URL, json=payload, timeout=FREE_TRANSLATE_TIMEOUT)
+    r = _HTTP["libretranslate"].post(FREE_TRANSLATE_URL, json=payload, timeout=FREE_TRANSLATE_TIMEOUT)
     r.raise_for_status()
     data = r.json()
     out = (data.get("translatedText") or data.get("translation") or "").strip()
@@ -182,44 +510,356 @@ def _call_libretranslate(text: str, target_language: str) -> str:
     return out
 
 
+# ========== Tiers (trả về chuỗi có prefix, lỗi thì raise) ==========
+def _tier_gemini(text: str, target_language: str, priority: int = PRIORITY_NORMAL) -> str:
+    g = call_gemini_translate(text, target_language=target_language, priority=priority)
+    # CHỈ nhận Gemini nếu có prefix thành công "🔁 "
+    if isinstance(g, str) and g.startswith("🔁 "):
+        return g
+    raise RuntimeError(g or "Gemini returned empty")
+
+
+def _tier_googletrans(text: str, target_language: str, priority: int = PRIORITY_NORMAL) -> str:
+    gt = _call_googletrans(text, target_language)
+    return "🌐 " + _repair_markdown_structure(text, gt)
+
+
+def _tier_libretranslate(text: str, target_language: str, priority: int = PRIORITY_NORMAL) -> str:
+    lt = _call_libretranslate(text, target_language)
+    return "🆓 " + _repair_markdown_structure(text, lt)
+
+
+_TIERS = (
+    ("gemini", _tier_gemini),
+    ("googletrans", _tier_googletrans),
+    ("libretranslate", _tier_libretranslate),
+)
+
+
+# ======= Circuit breaker: provider hỏng thì bỏ qua ngay, thử lại ở nền =======
+def _probe(name, tier_fn):
+    def probe():
+        if name == "gemini":
+            # probe không được ăn vào quota dành cho message thật: chỉ chạy khi còn dư
+            # ít nhất 1 request sau probe; không thì coi như chưa kết luận (RateLimited)
+            wait = GEMINI_LIMITER.headroom(_estimate_tokens("ping"), requests=2)
+            if wait > 0:
+                raise RateLimited(wait, "probe skipped: no spare quota")
+        # PRIORITY_NORMAL: không chờ quota; hết quota / 429 → RateLimited, không tính là lỗi
+        return bool(tier_fn("ping", "en", PRIORITY_NORMAL))
+    return probe
+
+_BREAKERS = {
+    name: CircuitBreaker(
+        name,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        cooldown_sec=BREAKER_COOLDOWN_SEC,
+        probe_fn=_probe(name, fn),
+        inconclusive=(RateLimited,),
+    )
+    for name, fn in _TIERS
+}
+
+
+def breaker_states() -> dict:
+    """Trạng thái circuit breaker của từng provider."""
+    return {name: br.snapshot() for name, br in _BREAKERS.items()}
+
+
+# ======= Latency quan sát được của từng provider (dùng cho hedging) =======
+class _LatencyTracker:
+    def __init__(self, maxlen: int = 200):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float):
+        with self._lock:
+            data = sorted(self._samples)
+        if len(data) < 5:
+            return None
+        idx = min(len(data) - 1, max(0, int(round(pct / 100.0 * (len(data) - 1)))))
+        return data[idx]
+
+
+_LATENCY = {name: _LatencyTracker() for name, _ in _TIERS}
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+def hedge_delay(provider: str) -> float:
+    """Chờ provider bao lâu trước khi hedge sang tầng kế (percentile latency, có sàn)."""
+    p = _LATENCY[provider].percentile(HEDGE_PERCENTILE)
+    if p is None:
+        return HEDGE_DEFAULT_DELAY_SEC
+    return max(HEDGE_MIN_DELAY_SEC, p)
+
+
+def provider_allowed(name: str) -> bool:
+    """Breaker của provider cho gọi không (mạch đóng / đến lượt probe)."""
+    return _BREAKERS[name].allow()
+
+
+def record_provider(name: str, ok: bool, seconds: float = None):
+    """Kết quả 1 lần gọi provider → breaker + latency. Hết quota không gọi hàm này (không phải lỗi)."""
+    if not ok:
+        _BREAKERS[name].record_failure()
+        return
+    _BREAKERS[name].record_success()
+    if seconds is not None:
+        _LATENCY[name].record(seconds)
+
+
+def _run_tier(name: str, tier_fn, text: str, target_language: str, priority: int = PRIORITY_NORMAL) -> str:
+    """Gọi 1 tầng, cập nhật breaker + latency (hết quota không tính là provider hỏng)."""
+    t0 = time.monotonic()
+    try:
+        out = tier_fn(text, target_language, priority)
+    except RateLimited:
+        raise
+    except Exception:
+        record_provider(name, False)
+        raise
+    record_provider(name, True, time.monotonic() - t0)
+    return out
+
+
+def _translate_sequential(text: str, target_language: str, priority: int = PRIORITY_NORMAL, skip=()):
+    for name, tier_fn in _TIERS:
+        if name in skip or not provider_allowed(name):
+            continue
+        try:
+            return name, _run_tier(name, tier_fn, text, target_language, priority)
+        except RateLimited as e:
+            if priority >= PRIORITY_NORMAL:
+                raise TranslationDeferred(e.retry_after)
+            continue
+        except Exception:
+            continue
+    return None, ""
+
+
+def _translate_hedged(text: str, target_language: str, priority: int = PRIORITY_NORMAL, skip=()):
+    """
+    Gọi tầng đầu; nếu quá percentile latency của nó mà chưa xong thì gọi thêm tầng kế
+    song song. Lấy kết quả hợp lệ đến trước, bỏ qua (cancel nếu chưa chạy) phần còn lại.
+    """
+    tiers = iter([t for t in _TIERS if t[0] not in skip])
+    pending = {}
+
+    def _launch():
+        for name, tier_fn in tiers:
+            if provider_allowed(name):
+                fut = _HEDGE_POOL.submit(_run_tier, name, tier_fn, text, target_language, priority)
+                pending[fut] = name
+                return time.monotonic() + hedge_delay(name)
+        return None
+
+    deadline = _launch()
+    while pending:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # tầng đang chạy quá chậm → hedge sang tầng kế
+            deadline = _launch()
+            continue
+        for fut in done:
+            name = pending.pop(fut)
+            try:
+                out = fut.result()
+            except Exception:
+                continue
+            for loser in pending:
+                loser.cancel()
+            return name, out
+        if not pending:
+            deadline = _launch()
+    return None, ""
+
+
+def span_attempts(text: str) -> list:
+    """
+    Các lượt gửi cho 1 message: [(text gửi provider, hàm dựng lại bản dịch → "" nếu hỏng)].
+    Có code / URL / mention → gửi phần văn xuôi (placeholder) trước, model làm hỏng placeholder
+    thì dịch lại nguyên văn. Chỉ toàn code / URL → [] (không cần dịch).
+    """
+    skeleton, spans = protect_spans(text)
+    whole = (text, lambda out: out)
+    if not spans:
+        return [whole]
+    if not has_prose(skeleton):
+        return []
+    return [(skeleton, lambda out: restore_spans(out, spans) or ""), whole]
+
+
 # ========== Public API: dịch với fallback ==========
-def translate_with_fallback(text: str, target_language: str = "vi") -> str:
+def translate_with_fallback(text: str, target_language: str = "vi", hedge: bool = False,
+                            priority: int = PRIORITY_NORMAL, skip=(), checked: bool = False) -> str:
     """
     Chuỗi fallback:
         1) Gemini (prefix 🔁)
         2) googletrans (prefix 🌐)
         3) LibreTranslate (prefix 🆓)
+    Provider đang "mở mạch" (lỗi liên tiếp) bị bỏ qua ngay, không tốn timeout.
+    hedge=True (mention): tầng trước chậm quá percentile latency thì gọi song song tầng sau.
+    priority: mention được chờ quota Gemini; chat thường (PRIORITY_NORMAL) gặp lúc hết quota
+    thì raise TranslationDeferred thay vì rơi xuống googletrans / LibreTranslate.
+    Message đã ở sẵn ngôn ngữ đích (nhận diện cục bộ) → trả rỗng, không gọi mạng.
+    skip: tên các provider bỏ qua (vd. ("gemini",) khi Gemini vừa được gọi bất đồng bộ).
+    checked=True: caller đã nhận diện ngôn ngữ + tra cache cho message này (translate_all,
+    translate_many, bản async) → không làm lại.
     KHÔNG bao giờ trả về chuỗi "[Lỗi dịch]" ra ngoài; nếu tất cả đều lỗi -> trả rỗng.
     """
-    text = text or ""
-    if not text.strip():
-        return ""
-
-    # 1) Gemini
-    try:
-        g = call_gemini_translate(text, target_language=target_language)
-        # CHỈ nhận Gemini nếu có prefix thành công "🔁 "
-        if isinstance(g, str) and g.startswith("🔁 "):
-            return g
-    except Exception:
-        pass
+    if checked:
+        tgt = _norm_lang(target_language)
+    else:
+        tgt, done = cache_lookup(text, target_language)
+        if done is not None:
+            return done
+
+    run = _translate_hedged if hedge else _translate_sequential
+    provider, out = None, ""
+    for part, finish in span_attempts(text):
+        provider, out = run(part, target_language, priority, skip)
+        out = finish(out) if out else ""
+        if out:
+            break
+
+    if out:
+        _cache_put(text, tgt, out, provider)
+    return out
 
-    # 2) googletrans
-    try:
-        gt = _call_googletrans(text, target_language)
-        if gt:
-            gt = _repair_markdown_structure(text, gt)
-            return "🌐 " + gt
-    except Exception:
-        pass
 
-    # 3) LibreTranslate
-    try:
-        lt = _call_libretranslate(text, target_language)
-        if lt:
-            lt = _repair_markdown_structure(text, lt)
-            return "🆓 " + lt
-    except Exception:
-        pass
+def translate_many(texts: list, target_language: str = "vi", priority: int = PRIORITY_NORMAL) -> list:
+    """
+    Dịch nhiều message một lúc (dùng cho micro-batch của worker).
+    Cache trước; phần còn thiếu gửi Gemini theo lô (giới hạn số item + số ký tự);
+    lô nào lỗi / lệch số segment thì dịch từng message qua translate_with_fallback.
+    Hết quota Gemini với chat thường → raise TranslationDeferred (cả lô thử lại sau).
+    """
+    results = [""] * len(texts)
+    tgt = _norm_lang(target_language)
 
-    return ""
+    misses = {}  # text -> [index...]
+    protected = {}  # text -> (skeleton, spans)
+    sources = {}  # text -> ngôn ngữ gốc (nhận diện 1 lần cho mỗi text)
+    for i, text in enumerate(texts):
+        text = text or ""
+        if not text.strip():
+            continue
+        if text not in sources:
+            sources[text] = _source_language(text)
+        if _same_language(sources[text], tgt):
+            continue
+        if text not in protected:
+            protected[text] = protect_spans(text)
+        skeleton, spans = protected[text]
+        if spans and not has_prose(skeleton):
+            continue
+        cached = _cache_get(text, tgt)
+        if cached:
+            results[i] = cached
+        else:
+            misses.setdefault(text, []).append(i)
+
+    def _fill(text, out):
+        for i in misses[text]:
+            results[i] = out
+
+    pending = list(misses)
+    if len(pending) > 1:
+        for chunk in _batch_chunks(pending, key=lambda t: len(protected[t][0])):
+            outs = None
+            if len(chunk) > 1 and _BREAKERS["gemini"].allow():
+                # lô lỗi không tính vào breaker: từng message sẽ đi lại qua chuỗi fallback
+                try:
+                    outs = call_gemini_translate_batch([protected[t][0] for t in chunk],
+                                                       target_language=target_language,
+                                                       priority=priority)
+                except RateLimited as e:
+                    if priority >= PRIORITY_NORMAL:
+                        raise TranslationDeferred(e.retry_after)
+                    outs = None
+                if outs is not None:
+                    _BREAKERS["gemini"].record_success()
+            if outs is None:
+                for text in chunk:
+                    _fill(text, translate_with_fallback(text, target_language, priority=priority, checked=True))
+                continue
+            for text, out in zip(chunk, outs):
+                out = restore_spans(out, protected[text][1])
+                if out is None:
+                    out = translate_with_fallback(text, target_language, priority=priority, checked=True)
+                else:
+                    _cache_put(text, tgt, out, "gemini")
+                _fill(text, out)
+    elif pending:
+        _fill(pending[0], translate_with_fallback(pending[0], target_language, priority=priority,
+                                                  checked=True))
+
+    return results
+
+
+def _batch_chunks(texts: list, key=len):
+    chunk, size = [], 0
+    for text in texts:
+        n = key(text)
+        if chunk and (len(chunk) >= BATCH_MAX_ITEMS or size + n > BATCH_MAX_CHARS):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(text)
+        size += n
+    if chunk:
+        yield chunk
+
+
+def translate_all(text: str, langs=ALL_LANGS, hedge: bool = False,
+                  priority: int = PRIORITY_NORMAL) -> dict:
+    """
+    Dịch 1 message sang mọi ngôn ngữ trong langs (mặc định vi/en/ja/id) → {lang: bản dịch}.
+    Ngôn ngữ đã có trong cache / trùng ngôn ngữ gốc thì bỏ qua; phần còn lại gửi 1 request
+    Gemini; lỗi / thiếu ngôn ngữ thì dịch riêng từng ngôn ngữ qua translate_with_fallback.
+    """
+    results = {lang: "" for lang in langs}
+    text = text or ""
+    if not text.strip():
+        return results
+
+    skeleton, spans = protect_spans(text)
+    if spans and not has_prose(skeleton):
+        return results
+
+    # nhận diện 1 lần cho message, so với từng ngôn ngữ đích
+    source = _source_language(text)
+    missing = []
+    for lang in langs:
+        if _same_language(source, lang):
+            continue
+        cached = _cache_get(text, lang)
+        if cached:
+            results[lang] = cached
+        else:
+            missing.append(lang)
+
+    if len(missing) > 1 and _BREAKERS["gemini"].allow():
+        try:
+            outs = call_gemini_translate_multi(skeleton, missing, priority=priority)
+        except RateLimited as e:
+            if priority >= PRIORITY_NORMAL:
+                raise TranslationDeferred(e.retry_after)
+            outs = None
+        if outs is not None:
+            _BREAKERS["gemini"].record_success()
+            for lang, out in outs.items():
+                out = restore_spans(out, spans)
+                if out is None:
+                    continue
+                _cache_put(text, lang, out, "gemini")
+                results[lang] = out
+                missing.remove(lang)
+
+    for lang in missing:
+        results[lang] = translate_with_fallback(text, lang, hedge=hedge, priority=priority, checked=True)
+    return results
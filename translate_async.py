@@ -0,0 +1,141 @@
+# translate_async.py
+"""
+Dịch bất đồng bộ cho AsyncWSClient: Gemini được gọi bằng aiohttp, nên hàng trăm bản dịch
+đang chờ không tốn thêm thread nào. Prompt / payload / xử lý 429, cache, nhận diện ngôn ngữ,
+span, rate limiter, circuit breaker và latency dùng helper public của translate.py.
+Tra / ghi cache (SQLite) chạy trong 1 thread riêng, không chặn GUI thread.
+
+Gemini không cho bản dịch → các tầng sau (googletrans / LibreTranslate, vẫn là thư viện đồng bộ)
+chạy trong 1 pool thread nhỏ qua translate_with_fallback(skip=("gemini",)). Chế độ all-langs
+(translate_all) cũng chạy trong pool đó.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from config_loader import GEMINI_URL
+from rate_limiter import RateLimited
+from translate import (
+    PRIORITY_NORMAL, TranslationDeferred, GEMINI_LIMITER, GEMINI_TIMEOUT_SEC,
+    gemini_enabled, gemini_headers, gemini_wait_budget, gemini_rate_limited, gemini_text,
+    gemini_attempts, gemini_translate_prompt, gemini_translate_output,
+    provider_allowed, record_provider, hedge_delay, span_attempts,
+    cache_lookup, cache_store, translate_with_fallback, translate_all,
+)
+
+_FALLBACK_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="translate-fallback")
+# cache bản dịch là SQLite (SELECT + UPDATE + commit mỗi lần tra) → không chạy trên GUI thread
+_CACHE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translate-cache")
+
+
+def _in_pool(pool, fn, *args, **kwargs):
+    return asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+
+async def _gemini_post(session, payload: dict, tokens: int, priority: int) -> str:
+    await GEMINI_LIMITER.acquire_async(tokens, timeout=gemini_wait_budget(priority))
+    async with session.post(GEMINI_URL, headers=gemini_headers(), json=payload,
+                            timeout=aiohttp.ClientTimeout(total=GEMINI_TIMEOUT_SEC)) as resp:
+        limited = gemini_rate_limited(resp.status, resp.headers)
+        if limited:
+            raise limited
+        resp.raise_for_status()
+        return gemini_text(await resp.json(content_type=None))
+
+
+async def call_gemini_translate_async(session, text: str, target_language: str = "vi",
+                                      priority: int = PRIORITY_NORMAL) -> str:
+    """
+    Bản async của call_gemini_translate: trả về chuỗi có prefix '🔁 '.
+    Lỗi → raise (các lượt thử như _gemini_generate, xem gemini_attempts).
+    """
+    tokens, payloads = gemini_attempts(gemini_translate_prompt(text, target_language))
+    for i, payload in enumerate(payloads):
+        try:
+            raw = await _gemini_post(session, payload, tokens, priority)
+        except RateLimited:
+            raise
+        except Exception:
+            if i == len(payloads) - 1:
+                raise
+            continue
+        return gemini_translate_output(text, raw)
+
+
+async def _tier_gemini(session, text: str, target_language: str, priority: int) -> str:
+    """Tầng Gemini qua circuit breaker; lỗi / mạch mở → "". Chat thường hết quota → TranslationDeferred."""
+    if not gemini_enabled() or not provider_allowed("gemini"):
+        return ""
+    t0 = time.monotonic()
+    try:
+        out = await call_gemini_translate_async(session, text, target_language, priority)
+    except RateLimited as e:
+        if priority >= PRIORITY_NORMAL:
+            raise TranslationDeferred(e.retry_after)
+        return ""
+    except Exception:
+        record_provider("gemini", False)
+        return ""
+    record_provider("gemini", True, time.monotonic() - t0)
+    return out
+
+
+async def _gemini_with_spans(session, attempts, target_language: str, priority: int) -> str:
+    for part, finish in attempts:
+        out = await _tier_gemini(session, part, target_language, priority)
+        out = finish(out) if out else ""
+        if out:
+            return out
+    return ""
+
+
+def _run_fallback(fn, *args, **kwargs):
+    return _in_pool(_FALLBACK_POOL, fn, *args, **kwargs)
+
+
+async def translate_with_fallback_async(session, text: str, target_language: str = "vi",
+                                        hedge: bool = False, priority: int = PRIORITY_NORMAL) -> str:
+    """
+    Cùng hợp đồng với translate_with_fallback (bản dịch có prefix, lỗi hết → "").
+    hedge=True: Gemini chậm quá percentile latency thì chạy song song các tầng sau, lấy kết quả đến trước.
+    """
+    text = text or ""
+    tgt, done = await _in_pool(_CACHE_POOL, cache_lookup, text, target_language)
+    if done is not None:
+        return done
+    attempts = span_attempts(text)
+    if not attempts:
+        return ""
+
+    gemini = asyncio.ensure_future(_gemini_with_spans(session, attempts, target_language, priority))
+    fallback = None
+    try:
+        if hedge:
+            done, _ = await asyncio.wait({gemini}, timeout=hedge_delay("gemini"))
+            if not done:
+                fallback = _run_fallback(translate_with_fallback, text, target_language,
+                                         priority=priority, skip=("gemini",), checked=True)
+                done, _ = await asyncio.wait({gemini, fallback}, return_when=asyncio.FIRST_COMPLETED)
+                if fallback in done and fallback.result():
+                    return fallback.result()
+        out = await gemini
+    finally:
+        gemini.cancel()
+    if out:
+        await _in_pool(_CACHE_POOL, cache_store, text, tgt, out, "gemini")
+        return out
+    if fallback is None:
+        fallback = _run_fallback(translate_with_fallback, text, target_language,
+                                 priority=priority, skip=("gemini",), checked=True)
+    return await fallback
+
+
+async def translate_async(session, text: str, target_language: str = "vi",
+                          priority: int = PRIORITY_NORMAL, hedge: bool = False, all_langs: bool = False):
+    """Điểm vào của AsyncWSClient; all_langs=True trả về dict lang -> bản dịch như translate_all."""
+    if all_langs:
+        return await _run_fallback(translate_all, text, hedge=hedge, priority=priority)
+    return await translate_with_fallback_async(session, text, target_language, hedge=hedge, priority=priority)
@@ -0,0 +1,115 @@
+# translate_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hoá để 'LGTM ' và 'LGTM' trúng cùng 1 key (giữ nguyên xuống dòng)."""
+    text = unicodedata.normalize("NFC", text or "")
+    lines = [ln.rstrip() for ln in text.replace("\r\n", "\n").split("\n")]
+    return "\n".join(lines).strip()
+
+
+class TranslationCache:
+    """
+    Cache bản dịch trên đĩa (SQLite), sống qua các lần khởi động lại.
+    Key = sha256(văn bản đã chuẩn hoá + ngôn ngữ đích + version provider/prompt).
+    Hết hạn theo TTL từng entry; vượt max_entries thì xoá entry ít dùng gần đây nhất.
+    """
+    _EVICT_EVERY = 100  # số lần put giữa 2 lần dọn dẹp
+
+    def __init__(self, path: str, ttl_sec: float = 30 * 86400, max_entries: int = 20000):
+        self.path = path
+        self.ttl_sec = float(ttl_sec)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " target TEXT NOT NULL,"
+                " provider TEXT,"
+                " translated TEXT NOT NULL,"
+                " expires REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache(last_used)")
+            self._db.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(text: str, target_lang: str, version: str) -> str:
+        raw = "\x1f".join((version or "", target_lang or "", normalize_text(text)))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, target_lang: str, version: str = ""):
+        key = self.make_key(text, target_lang, version)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT translated, expires FROM cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE cache SET last_used=? WHERE key=?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, text: str, target_lang: str, version: str, translated: str,
+            provider: str = "", ttl_sec: float = None):
+        if not translated:
+            return
+        key = self.make_key(text, target_lang, version)
+        now = time.time()
+        ttl = self.ttl_sec if ttl_sec is None else float(ttl_sec)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache(key, target, provider, translated, expires, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, target_lang, provider, translated, now + ttl, now),
+            )
+            self._db.commit()
+            self._puts += 1
+            due = (self._puts % self._EVICT_EVERY) == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Xoá entry hết hạn, rồi cắt bớt theo LRU nếu vượt max_entries."""
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+            count = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            over = count - self.max_entries
+            if over > 0:
+                self._db.execute(
+                    "DELETE FROM cache WHERE key IN"
+                    " (SELECT key FROM cache ORDER BY last_used ASC LIMIT ?)",
+                    (over,),
+                )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM cache")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": size,
+        }
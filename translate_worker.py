@@ -0,0 +1,191 @@
+# translate_worker.py
+import itertools
+import queue
+import threading
+import time
+
+
+class TranslateWorkerPool:
+    """
+    Hàng đợi dịch (ưu tiên) có giới hạn + N worker thread.
+    Thread websocket chỉ parse/lọc rồi submit(); việc gọi API dịch chạy ở worker,
+    kết quả được trả qua callback on_done(key, target_lang, translated).
+
+    priority nhỏ hơn được dịch trước (vd. mention cá nhân trước @channel trước chat thường).
+
+    Nếu có batch_fn: worker gom các job có priority >= batch_min_priority và không có opts
+    đến trong batch_window giây (tối đa batch_max job) rồi dịch 1 lần bằng
+    batch_fn(texts, target_language=..., priority=...) -> list. Job khác luôn dịch riêng.
+
+    Nếu translate_fn / batch_fn raise một trong defer_exceptions (có thuộc tính retry_after),
+    job được đưa lại hàng đợi sau retry_after giây thay vì bỏ.
+    """
+    _STOP = -1
+    MAX_DEFERS = 20
+
+    def __init__(self, translate_fn, on_done, workers=3, max_queue=200,
+                 batch_fn=None, batch_window=0.0, batch_max=20, batch_min_priority=0,
+                 defer_exceptions=()):
+        self._translate_fn = translate_fn
+        self._on_done = on_done
+        self._batch_fn = batch_fn
+        self._batch_window = max(0.0, float(batch_window or 0))
+        self._batch_max = max(1, int(batch_max or 1))
+        self._batch_min_priority = batch_min_priority
+        self._defer_exceptions = tuple(defer_exceptions)
+        self._workers = max(1, int(workers or 1))
+        self._queue = queue.PriorityQueue(maxsize=max(1, int(max_queue or 1)))
+        self._seq = itertools.count()
+        self._threads = []
+        self._stopping = False
+
+        # số job bị bỏ vì hàng đợi đầy / số lần hoãn vì hết quota
+        self.dropped = 0
+        self.deferred = 0
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping = False
+        for i in range(self._workers):
+            t = threading.Thread(target=self._worker, name=f"translate-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stopping = True
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait((self._STOP, next(self._seq), None))
+            except queue.Full:
+                break
+        self._threads = []
+
+    def submit(self, key: str, text: str, target_lang: str, priority: int = 0, **opts) -> bool:
+        """
+        Đưa job vào hàng đợi, KHÔNG block. Trả về False nếu hàng đợi đầy.
+        opts được chuyển nguyên cho translate_fn (vd. hedge=True).
+        """
+        return self._put((priority, next(self._seq), (key, text, target_lang, opts, 0)))
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _put(self, item) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _batchable(self, item) -> bool:
+        priority, _, job = item
+        return (
+            self._batch_fn is not None and self._batch_window > 0
+            and priority >= self._batch_min_priority and not any(job[3].values())
+        )
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item[2] is None or self._stopping:
+                self._queue.task_done()
+                return
+            if not self._batchable(item):
+                self._run_single(item)
+                self._queue.task_done()
+                continue
+
+            batch, singles = self._collect_batch(item)
+            for it in singles:
+                self._run_single(it)
+            self._run_batch(batch)
+            for _ in range(len(batch) + len(singles)):
+                self._queue.task_done()
+
+    def _collect_batch(self, first):
+        """Gom thêm job trong cửa sổ batch_window; job không gom được để riêng."""
+        batch, singles = [first], []
+        deadline = time.monotonic() + self._batch_window
+        while len(batch) < self._batch_max:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[2] is None:
+                # đang dừng: dịch nốt phần đã gom rồi thoát ở vòng sau
+                self._queue.task_done()
+                self._stopping = True
+                break
+            if self._batchable(item):
+                batch.append(item)
+            else:
+                singles.append(item)
+        # job ưu tiên cao dịch trước
+        singles.sort(key=lambda it: it[:2])
+        return batch, singles
+
+    def _run_single(self, item):
+        priority, _, (key, text, target_lang, opts, _defers) = item
+        try:
+            translated = self._translate_fn(text, target_language=target_lang, priority=priority, **opts)
+        except self._defer_exceptions as e:
+            self._defer([item], getattr(e, "retry_after", 1.0))
+            return
+        except Exception:
+            translated = ""
+        self._emit(key, target_lang, translated)
+
+    def _run_batch(self, batch):
+        groups = {}
+        for item in batch:
+            groups.setdefault((item[2][2], item[0]), []).append(item)
+        for (target_lang, priority), items in groups.items():
+            if len(items) == 1:
+                self._run_single(items[0])
+                continue
+            try:
+                outs = self._batch_fn([it[2][1] for it in items],
+                                      target_language=target_lang, priority=priority)
+            except self._defer_exceptions as e:
+                self._defer(items, getattr(e, "retry_after", 1.0))
+                continue
+            except Exception:
+                outs = None
+            if not outs or len(outs) != len(items):
+                for it in items:
+                    self._run_single(it)
+                continue
+            for it, translated in zip(items, outs):
+                self._emit(it[2][0], target_lang, translated)
+
+    def _defer(self, items, delay):
+        """Hết quota: đưa job lại hàng đợi sau `delay` giây (bỏ nếu đã hoãn quá nhiều lần)."""
+        retry = []
+        for priority, _, (key, text, target_lang, opts, defers) in items:
+            if defers >= self.MAX_DEFERS or self._stopping:
+                self._emit(key, target_lang, "")
+                continue
+            self.deferred += 1
+            retry.append((priority, next(self._seq), (key, text, target_lang, opts, defers + 1)))
+        if not retry:
+            return
+
+        def _requeue():
+            for it in retry:
+                if not self._put(it):
+                    self._emit(it[2][0], it[2][2], "")
+
+        t = threading.Timer(max(0.05, float(delay)), _requeue)
+        t.daemon = True
+        t.start()
+
+    def _emit(self, key, target_lang, translated):
+        try:
+            self._on_done(key, target_lang, translated or "")
+        except Exception:
+            pass
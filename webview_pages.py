@@ -1,8 +1,20 @@
 from PyQt6.QtWebEngineCore import QWebEnginePage
 from PyQt6.QtGui import QDesktopServices
-from PyQt6.QtCore import QUrl
+from PyQt6.QtCore import QUrl, pyqtSignal
+
+# JS gửi yêu cầu lên Python bằng console.log('mm:<lệnh>:<tham số>')
+BRIDGE_PREFIX = "mm:"
+
 
 class ExternalLinkPage(QWebEnginePage):
+    bridge_message = pyqtSignal(str)
+
+    def javaScriptConsoleMessage(self, level, message, line, source):
+        if message and message.startswith(BRIDGE_PREFIX):
+            self.bridge_message.emit(message[len(BRIDGE_PREFIX):])
+            return
+        super().javaScriptConsoleMessage(level, message, line, source)
+
     def acceptNavigationRequest(self, url, nav_type, isMainFrame):
         if nav_type == QWebEnginePage.NavigationType.NavigationTypeLinkClicked:
             if url.scheme() in ("http", "https", "mailto"):
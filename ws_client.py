@@ -1,7 +1,9 @@
 # ws_client.py  (phiên bản đầy đủ phần quan trọng)
 import json
+import random
 import threading
 import time
+from urllib.parse import urlencode
 import websocket
 from collections import deque
 
@@ -9,11 +11,22 @@ from PyQt6.QtCore import Qt
 
 from config_loader import (
     WS_URL, MY_USERNAME, WATCH_CHANNELS, USER_MAP, CHANNEL_MAP,
-    MMUSERID, MMAUTHTOKEN, API_KEY, GEMINI_URL
+    MMUSERID, MMAUTHTOKEN, API_KEY, GEMINI_URL,
+    TRANSLATE_WORKERS, TRANSLATE_QUEUE_SIZE, HEDGE_MENTIONS,
+    BATCH_WINDOW_MS, BATCH_MAX_ITEMS, TRANSLATE_ALL_LANGS, SERVER_URL,
+    CATCHUP_ENABLED, CATCHUP_MAX_AGE_MIN, CATCHUP_TIMEOUT_SEC, CATCHUP_WORKERS,
+    WS_PING_INTERVAL_SEC, WS_PING_TIMEOUT_SEC, RECONNECT_BASE_SEC, RECONNECT_MAX_SEC
 )
 from signals_bus import signals
 from notifications import send_clickable_toast
-from translate import call_gemini_translate
+from translate import (
+    translate_with_fallback, translate_many, translate_all, prewarm_connections, TranslationDeferred,
+    PRIORITY_PERSONAL, PRIORITY_CHANNEL, PRIORITY_NORMAL
+)
+from translate_worker import TranslateWorkerPool
+from message_store import STORE
+from ws_events import decode_post, decode_frame, peek_frame
+from catchup import fetch_missed
 
 
 class WSClient:
@@ -36,12 +49,57 @@ class WSClient:
         self._seen_hash = set()
         self._seen_hash_order = deque(maxlen=1000)
 
+        # channel_id -> create_at (ms) của post mới nhất đã nhận; reconnect lấy bù từ mốc này
+        self._marks = {}
+        if STORE is not None:
+            try:
+                self._marks = STORE.marks()
+            except Exception:
+                self._marks = {}
+        # kênh lấy bù bị lỗi -> mốc lấy bù còn nợ; mark của kênh đó không được lưu vượt qua mốc này
+        self._catchup_floor = {}
+        self._catchup_retry_at = 0.0
+
+        # resume phiên websocket: server giữ hàng đợi event theo connection_id,
+        # reconnect kèm connection_id + sequence_number thì server gửi lại event bị lỡ
+        self._connection_id = ""
+        self._next_seq = 0          # seq server kế tiếp mong đợi
+        self._resuming = False      # vừa reconnect kèm connection_id, chưa biết server có nhận không
+        self.resume_stats = {"resumed": 0, "refused": 0, "seq_gaps": 0}
+
+        # key cho message không có post id
+        self._local_seq = 0
+        # msg_key -> thời điểm submit, để lưu latency dịch vào message store
+        self._submitted = {}
+
+        # dịch bất đồng bộ: socket thread chỉ enqueue, worker gọi Gemini
+        self._translator = TranslateWorkerPool(
+            self._translate,
+            self._on_translated,
+            workers=TRANSLATE_WORKERS,
+            max_queue=TRANSLATE_QUEUE_SIZE,
+            batch_fn=translate_many,
+            batch_window=BATCH_WINDOW_MS / 1000.0,
+            batch_max=BATCH_MAX_ITEMS,
+            batch_min_priority=PRIORITY_NORMAL,
+            defer_exceptions=(TranslationDeferred,),
+        )
+
         # focus-aware notification gates
         self._app_started_ms = int(time.time() * 1000)
         self._last_focus_ms = 0
         self._connected_monotonic = 0.0
         self._FOCUS_BUFFER_MS = 2000
         self._RECONNECT_WARMUP_SEC = 2.0
+        self._CATCHUP_RETRY_SEC = 30.0
+
+        # heartbeat / reconnect: thời điểm nhận frame (hoặc pong) gần nhất, lúc phát hiện mất kết nối
+        self._last_rx = 0.0
+        self._down_since = None
+        self._attempt = 0
+        self._up_pending = False
+        self.conn_stats = {"reconnects": 0, "last_detect_sec": None, "last_recover_sec": None,
+                           "attempt": 0, "retry_in": None}
 
         # Signals
         signals.reset_count.connect(self._on_reset_count, type=Qt.ConnectionType.UniqueConnection)
@@ -75,6 +133,8 @@ class WSClient:
         if self._started:
             return
         self._started = True
+        self._translator.start()
+        prewarm_connections()
         t = threading.Thread(target=self._run_loop, daemon=True)
         t.start()
 
@@ -82,48 +142,265 @@ class WSClient:
         while True:
             try:
                 self.ws = websocket.WebSocketApp(
-                    WS_URL,
+                    self._ws_url(),
                     header=[self._cookie_header()],
                     on_message=self.on_message,
                     on_error=self.on_error,
                     on_close=self.on_close,
-                    on_open=self.on_open
+                    on_open=self.on_open,
+                    on_pong=self.on_pong,
                 )
-                self.ws.run_forever()
+                self.ws.run_forever(**self._ping_kwargs())
             except Exception:
                 pass
+            self._mark_down()
+            delay = self._backoff_delay()
+            self.conn_stats.update(attempt=self._attempt, retry_in=round(delay, 1))
             signals.set_connected.emit(False)
-            time.sleep(1)
+            signals.connection_stats.emit(dict(self.conn_stats))
+            time.sleep(delay)
+
+    def _ping_kwargs(self):
+        # websocket-client yêu cầu ping_interval > ping_timeout
+        if WS_PING_INTERVAL_SEC <= 0:
+            return {}
+        timeout = min(WS_PING_TIMEOUT_SEC, WS_PING_INTERVAL_SEC * 0.9) if WS_PING_TIMEOUT_SEC > 0 else None
+        return {"ping_interval": WS_PING_INTERVAL_SEC, "ping_timeout": timeout}
+
+    def _backoff_delay(self):
+        """base * 2^n, tối đa RECONNECT_MAX_SEC; jitter trong [delay/2, delay] để các client không dồn cùng lúc."""
+        delay = min(RECONNECT_MAX_SEC, RECONNECT_BASE_SEC * (2 ** min(self._attempt, 16)))
+        self._attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def _mark_down(self):
+        """Lần đầu phát hiện mất kết nối: ghi thời điểm + bao lâu không nhận được gì (time-to-detect)."""
+        if self._down_since is not None:
+            return
+        now = time.monotonic()
+        self._down_since = now
+        if self._last_rx:
+            self.conn_stats["last_detect_sec"] = round(now - self._last_rx, 1)
+
+    def _mark_up(self):
+        """Frame đầu tiên sau khi mở kết nối (trả lời auth / hello / event resume): reset backoff, ghi time-to-recover."""
+        if self._down_since is not None:
+            self.conn_stats["reconnects"] += 1
+            self.conn_stats["last_recover_sec"] = round(time.monotonic() - self._down_since, 1)
+        self._down_since = None
+        self._attempt = 0
+        self.conn_stats.update(attempt=0, retry_in=None)
+        signals.connection_stats.emit(dict(self.conn_stats))
+
+    def _submit_translation(self, key, text, target_lang, priority, **opts) -> bool:
+        """Đưa 1 message đi dịch (không block); False nếu không nhận được (hàng đợi đầy)."""
+        return self._translator.submit(key, text, target_lang, priority=priority, **opts)
+
+    def _translate(self, text, target_language="vi", priority=PRIORITY_NORMAL, hedge=False,
+                   all_langs=False):
+        if all_langs:
+            return translate_all(text, hedge=hedge, priority=priority)
+        return translate_with_fallback(text, target_language=target_language,
+                                       hedge=hedge, priority=priority)
+
+    def _on_translated(self, key, target_lang, translated):
+        # chạy trên worker thread; signal Qt tự queue sang GUI thread
+        self._store_translations(key, target_lang, translated)
+        if isinstance(translated, dict):
+            # all-langs: ngôn ngữ đích hiện tại trước, các ngôn ngữ khác sau
+            signals.message_translated.emit(key, target_lang, translated.get(target_lang, ""))
+            for lang, text in translated.items():
+                if lang != target_lang:
+                    signals.message_translated.emit(key, lang, text or "")
+            return
+        signals.message_translated.emit(key, target_lang, translated or "")
+
+    def _store_translations(self, key, target_lang, translated):
+        started = self._submitted.pop(key, None)
+        if STORE is None:
+            return
+        latency_ms = (time.monotonic() - started) * 1000 if started is not None else None
+        items = translated.items() if isinstance(translated, dict) else ((target_lang, translated),)
+        for lang, text in items:
+            self._store_write(STORE.set_translation, key, lang, text, latency_ms=latency_ms)
+
+    def _store_write(self, fn, *args, **kwargs):
+        """Ghi message store (SQLite) ngay trên thread hiện tại; AsyncWSClient đẩy sang thread ghi riêng."""
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            pass
+
+    def _ws_url(self):
+        if not self._connection_id:
+            return WS_URL
+        sep = "&" if "?" in WS_URL else "?"
+        return WS_URL + sep + urlencode({"connection_id": self._connection_id,
+                                         "sequence_number": self._next_seq})
 
     def _cookie_header(self):
         return f"Cookie: MMUSERID={MMUSERID}; MMAUTHTOKEN={MMAUTHTOKEN}"
 
     # ===== WebSocket callbacks =====
+    def _auth_message(self):
+        return json.dumps({"seq": 1, "action": "authentication_challenge", "data": {"token": MMAUTHTOKEN}})
+
     def on_open(self, ws):
         try:
-            auth = {"seq": 1, "action": "authentication_challenge", "data": {"token": MMAUTHTOKEN}}
-            ws.send(json.dumps(auth))
+            ws.send(self._auth_message())
         except Exception:
             pass
+        self._opened()
+
+    def _opened(self):
         self._connected_monotonic = time.monotonic()
+        self._last_rx = self._connected_monotonic
+        self._up_pending = True      # _mark_up khi nhận frame đầu tiên
+        # có connection_id cũ → URL đã xin resume; frame có seq đầu tiên cho biết kết quả
+        self._resuming = bool(self._connection_id)
         signals.set_connected.emit(True)
 
-    def on_message(self, ws, message):
-        try:
-            data = json.loads(message)
-        except Exception:
+    def _on_hello(self, message, seq):
+        """
+        Server chỉ gửi hello khi KHÔNG dùng lại kết nối cũ: kết nối mới, hoặc resume bị từ chối
+        (server restart / hàng đợi đã hết hạn) và được cấp connection_id mới → lấy bù qua REST.
+        Resume thành công thì không có hello (xem _check_seq).
+        """
+        data = decode_frame(message) or {}
+        conn_id = (data.get("data") or {}).get("connection_id") or ""
+        previous = self._connection_id
+        self._connection_id = conn_id
+        self._resuming = False
+        self._next_seq = (seq or 0) + 1
+        if previous and conn_id == previous:
+            self.resume_stats["resumed"] += 1
             return
-        if data.get("event") != "posted":
+        if previous:
+            self.resume_stats["refused"] += 1
+        # chạy trên socket thread: message live chờ trong socket tới khi lấy bù xong
+        self._catch_up()
+
+    def _catch_up(self):
+        """Lấy bù post của các kênh theo dõi từ high-water mark, đưa qua pipeline bình thường theo thứ tự."""
+        marks = self._catch_up_marks()
+        if not marks:
             return
         try:
-            post = json.loads(data["data"]["post"])
+            missed, failed = fetch_missed(
+                SERVER_URL, MMAUTHTOKEN, marks, user_id=MMUSERID,
+                timeout=CATCHUP_TIMEOUT_SEC, workers=CATCHUP_WORKERS,
+                deadline=self._catch_up_budget(),
+            )
         except Exception:
+            missed, failed = [], list(marks)
+        self._feed_missed(missed)
+        self._catch_up_result(marks, failed)
+
+    def _catch_up_budget(self):
+        """
+        Tổng số giây cho 1 lần lấy bù. Lấy bù chạy giữa 2 frame trên thread đọc socket, pong chỉ
+        được đọc sau đó → phải xong trước timeout pong, không thì kết nối bị đóng rồi lấy bù lại.
+        Kênh chưa xong khi hết giờ giữ mốc, thử lại sau (xem _catch_up_result).
+        """
+        pong_timeout = self._pong_timeout()
+        if not pong_timeout:
+            return CATCHUP_TIMEOUT_SEC
+        return min(CATCHUP_TIMEOUT_SEC, pong_timeout / 2)
+
+    def _pong_timeout(self):
+        return self._ping_kwargs().get("ping_timeout")
+
+    def _catch_up_marks(self):
+        """channel_id -> mốc lấy bù (ms) của các kênh theo dõi; {} nếu không cần / bị tắt."""
+        now_ms = int(time.time() * 1000)
+        floor_ms = now_ms - int(CATCHUP_MAX_AGE_MIN * 60 * 1000)
+        marks = {}
+        for ch in list(self._catchup_floor):
+            if ch not in self.watch_channels:
+                self._catchup_floor.pop(ch, None)
+        for ch in self.watch_channels:
+            if ch in self._catchup_floor:
+                marks[ch] = max(self._catchup_floor[ch], floor_ms)
+            elif ch in self._marks:
+                marks[ch] = max(self._marks[ch], floor_ms)
+            else:
+                # kênh chưa có mốc: bắt đầu từ lúc kết nối này
+                self._marks[ch] = now_ms
+        return marks if CATCHUP_ENABLED else {}
+
+    def _catch_up_result(self, marks, failed):
+        """Kênh lỗi giữ mốc lấy bù (thử lại sau _CATCHUP_RETRY_SEC / lần reconnect sau); kênh OK được lưu mark."""
+        for ch, since in marks.items():
+            if ch in failed:
+                self._catchup_floor[ch] = min(since, self._catchup_floor.get(ch, since))
+            elif self._catchup_floor.pop(ch, None) is not None and ch in self._marks:
+                self._persist_mark(ch, self._marks[ch])
+        self._catchup_retry_at = time.monotonic() + self._CATCHUP_RETRY_SEC if self._catchup_floor else 0.0
+
+    def _feed_missed(self, missed):
+        for post in missed:
+            if post.get("channel_id") in self.watch_channels:
+                self._handle_post(post)
+
+    def _advance_mark(self, channel_id, post_id, post_ms):
+        if not channel_id or post_ms <= self._marks.get(channel_id, 0):
             return
+        self._marks[channel_id] = post_ms
+        if channel_id not in self._catchup_floor:
+            # kênh còn nợ lấy bù: mark đã lưu đứng yên để restart vẫn lấy bù được
+            self._persist_mark(channel_id, post_ms, post_id)
 
-        channel_id = post.get("channel_id")
+    def _persist_mark(self, channel_id, post_ms, post_id=""):
+        if STORE is not None:
+            self._store_write(STORE.set_mark, channel_id, post_ms, post_id)
+
+    def on_pong(self, ws, data):
+        self._last_rx = time.monotonic()
+
+    def on_message(self, ws, message):
+        self._last_rx = time.monotonic()
+        if self._up_pending:
+            # server đã trả lời trên kết nối này (kể cả resume thành công, không có hello)
+            self._up_pending = False
+            self._mark_up()
+        if self._catchup_floor and time.monotonic() >= self._catchup_retry_at:
+            # lấy bù lại các kênh bị lỗi lần trước (trước frame hiện tại để giữ thứ tự)
+            self._catchup_retry_at = time.monotonic() + self._CATCHUP_RETRY_SEC
+            self._catch_up()
+        # lọc nhanh theo event / kênh trước, chỉ decode post của kênh đang theo dõi
         # 🔔 dùng runtime watch list thay vì hằng số
-        if channel_id not in self.watch_channels:
+        event, seq = peek_frame(message)
+        if event == "hello":
+            self._on_hello(message, seq)
+            return
+        if seq is not None:
+            self._check_seq(seq)
+        post = decode_post(message, self.watch_channels, event=event)
+        if post is None:
+            return
+        self._handle_post(post)
+
+    def _check_seq(self, seq):
+        """
+        Frame có seq đầu tiên sau khi xin resume (không kèm hello): đúng seq mong đợi → server đã
+        nhận resume và đang gửi lại event bị lỡ. Seq nhảy cóc (lúc resume hay giữa chừng) → server
+        bỏ sót event (hàng đợi tràn / resume một phần) → lấy bù qua REST.
+        """
+        expected = self._next_seq
+        self._next_seq = seq + 1
+        if self._resuming:
+            self._resuming = False
+            if seq == expected:
+                self.resume_stats["resumed"] += 1
+                return
+        elif not self._connection_id or seq == expected:
             return
+        self.resume_stats["seq_gaps"] += 1
+        self._catch_up()
+
+    def _handle_post(self, post):
+        """Dedupe → lưu → hiển thị → dịch → thông báo cho 1 post (live hoặc lấy bù)."""
+        channel_id = post.get("channel_id")
 
         post_id = post.get("id")
         if post_id:
@@ -153,18 +430,12 @@ class WSClient:
         is_personal = f"@{MY_USERNAME.lower()}" in lower
         is_channel = any(k in lower for k in ("@channel", "@here", "@all"))
 
-        # Translate
-        if API_KEY and GEMINI_URL:
-            try:
-                translated = call_gemini_translate(raw_text, target_language=self.target_lang)
-            except Exception:
-                translated = ""
+        if post_id:
+            msg_key = post_id
         else:
-            translated = ""
-
-        signals.new_message.emit(sender, channel_name, raw_text, translated)
-        self.msg_count += 1
-        signals.update_count.emit(self.msg_count)
+            self._local_seq += 1
+            # gắn thời điểm khởi động để key không trùng với lần chạy trước (message store / log)
+            msg_key = f"local-{self._app_started_ms}-{self._local_seq}"
 
         try:
             post_ms = int(post.get("create_at") or 0)
@@ -172,6 +443,41 @@ class WSClient:
             post_ms = 0
         if post_ms <= 0:
             post_ms = int(time.time() * 1000)
+        self._advance_mark(channel_id, post_id, post_ms)
+
+        if STORE is not None:
+            self._store_write(
+                STORE.add_message,
+                msg_key, raw_text, post_id=post_id or "", channel_id=channel_id or "",
+                channel=channel_name, user_id=user_id, sender=sender, create_at=post_ms,
+                css_class="mention" if is_personal else "normal",
+            )
+
+        # Hiện bản gốc ngay; bản dịch đến sau qua signals.message_translated
+        signals.new_message.emit(sender, channel_name, raw_text, "", msg_key)
+
+        target_lang = self.target_lang
+        queued = False
+        if API_KEY and GEMINI_URL and raw_text:
+            self._submitted[msg_key] = time.monotonic()
+            if is_personal:
+                priority = PRIORITY_PERSONAL
+            elif is_channel:
+                priority = PRIORITY_CHANNEL
+            else:
+                priority = PRIORITY_NORMAL
+            queued = self._submit_translation(
+                msg_key, raw_text, target_lang,
+                priority=priority,
+                hedge=HEDGE_MENTIONS and priority < PRIORITY_NORMAL,
+                all_langs=TRANSLATE_ALL_LANGS,
+            )
+        if not queued:
+            self._submitted.pop(msg_key, None)
+            signals.message_translated.emit(msg_key, target_lang, "")
+
+        self.msg_count += 1
+        signals.update_count.emit(self.msg_count)
 
         baseline_ms = max(self._app_started_ms, self._last_focus_ms)
         is_old_vs_focus = post_ms < (baseline_ms - self._FOCUS_BUFFER_MS)
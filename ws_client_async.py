@@ -0,0 +1,156 @@
+# ws_client_async.py
+"""
+WSClient chạy trên asyncio, dùng chung event loop với Qt (qasync) — bật bằng
+WS_CLIENT_MODE = "asyncio" trong config.
+
+  - nhận frame, lấy bù post (REST), dịch Gemini (aiohttp) đều là coroutine trên GUI thread:
+    không có socket thread, signal Qt gọi slot trực tiếp;
+  - mỗi bản dịch là 1 task, hàng trăm bản dịch đang chờ không tốn thread nào
+    (chỉ tầng fallback đồng bộ googletrans / LibreTranslate chạy trong pool nhỏ, xem translate_async.py);
+  - ghi message store (SQLite commit mỗi message / mark / bản dịch) đi qua 1 thread ghi riêng,
+    đúng thứ tự, GUI thread không chờ đĩa;
+  - reconnect / thoát app: task kết nối bị cancel, task dịch bị cancel khi thoát.
+
+Lọc frame, dedupe, resume phiên, high-water mark, backoff và số liệu kết nối dùng lại
+nguyên logic của WSClient.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from config_loader import (
+    SERVER_URL, MMUSERID, MMAUTHTOKEN, TRANSLATE_QUEUE_SIZE,
+    WS_PING_INTERVAL_SEC, CATCHUP_TIMEOUT_SEC,
+)
+from catchup import fetch_missed_async
+from signals_bus import signals
+from translate import TranslationDeferred, prewarm_connections
+from translate_async import translate_async
+from translate_worker import TranslateWorkerPool
+from ws_client import WSClient
+
+
+class AsyncWSClient(WSClient):
+    def __init__(self):
+        super().__init__()
+        self._session = None
+        self._main_task = None
+        self._tasks = set()           # task dịch đang chạy
+        self._catch_up_marks_pending = None  # mốc lấy bù, chụp lúc phát hiện cần lấy bù
+        self._store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store-writer")
+
+        # số bản dịch bị bỏ vì quá TRANSLATE_QUEUE_SIZE đang chờ / số lần hoãn vì hết quota
+        self.dropped = 0
+        self.deferred = 0
+
+    # ===== lifecycle =====
+    def start(self):
+        """Gọi khi event loop (qasync) đã được set; không tạo thread."""
+        if self._started:
+            return
+        self._started = True
+        prewarm_connections()  # kết nối keep-alive cho các tầng fallback đồng bộ
+        self._main_task = asyncio.ensure_future(self._main())
+
+    async def stop(self):
+        """Huỷ kết nối + mọi bản dịch đang chờ, đóng HTTP session."""
+        tasks = [t for t in (self._main_task, *self._tasks) if t is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        # ghi nốt các message / bản dịch còn trong hàng đợi trước khi thoát
+        self._store_writer.shutdown(wait=True)
+
+    async def _main(self):
+        self._session = aiohttp.ClientSession()
+        while True:
+            try:
+                await self._connect_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            self._mark_down()
+            delay = self._backoff_delay()
+            self.conn_stats.update(attempt=self._attempt, retry_in=round(delay, 1))
+            signals.set_connected.emit(False)
+            signals.connection_stats.emit(dict(self.conn_stats))
+            await asyncio.sleep(delay)
+
+    async def _connect_once(self):
+        name, _, value = self._cookie_header().partition(": ")
+        heartbeat = WS_PING_INTERVAL_SEC if WS_PING_INTERVAL_SEC > 0 else None
+        # heartbeat: aiohttp ping định kỳ, không có pong trong heartbeat/2 giây thì đóng kết nối
+        async with self._session.ws_connect(self._ws_url(), headers={name: value},
+                                            heartbeat=heartbeat) as ws:
+            await ws.send_str(self._auth_message())
+            self._opened()
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+                    continue
+                self.on_message(ws, msg.data)
+                if self._catch_up_marks_pending is not None:
+                    # lấy bù xong mới đọc frame live tiếp theo
+                    marks, self._catch_up_marks_pending = self._catch_up_marks_pending, None
+                    await self._catch_up_async(marks)
+
+    # ===== message store =====
+    def _store_write(self, fn, *args, **kwargs):
+        # 1 thread ghi → message, mark và bản dịch vẫn vào DB đúng thứ tự nhận
+        self._store_writer.submit(super()._store_write, fn, *args, **kwargs)
+
+    # ===== catch-up =====
+    def _pong_timeout(self):
+        # aiohttp heartbeat: không có pong trong heartbeat/2 giây thì đóng kết nối
+        return WS_PING_INTERVAL_SEC / 2 if WS_PING_INTERVAL_SEC > 0 else None
+
+    def _catch_up(self):
+        # gọi từ on_message (hello / seq bị hụt): chạy ngay sau frame hiện tại, xem _connect_once.
+        # mốc chụp ngay bây giờ, trước khi post của frame hiện tại nâng high-water mark
+        pending = self._catch_up_marks_pending or {}
+        for ch, since in self._catch_up_marks().items():
+            pending[ch] = min(since, pending.get(ch, since))
+        self._catch_up_marks_pending = pending
+
+    async def _catch_up_async(self, marks):
+        if not marks:
+            return
+        try:
+            missed, failed = await fetch_missed_async(
+                self._session, SERVER_URL, MMAUTHTOKEN, marks, user_id=MMUSERID,
+                timeout=CATCHUP_TIMEOUT_SEC, deadline=self._catch_up_budget(),
+            )
+        except Exception:
+            missed, failed = [], list(marks)
+        self._feed_missed(missed)
+        self._catch_up_result(marks, failed)
+
+    # ===== translation =====
+    def _submit_translation(self, key, text, target_lang, priority, **opts) -> bool:
+        if len(self._tasks) >= TRANSLATE_QUEUE_SIZE:
+            self.dropped += 1
+            return False
+        task = asyncio.ensure_future(self._translate_task(key, text, target_lang, priority, opts))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _translate_task(self, key, text, target_lang, priority, opts):
+        translated = ""
+        for _ in range(TranslateWorkerPool.MAX_DEFERS + 1):
+            try:
+                translated = await translate_async(self._session, text, target_lang,
+                                                   priority=priority, **opts)
+                break
+            except TranslationDeferred as e:
+                # hết quota Gemini: chờ rồi thử lại, không giữ thread nào
+                self.deferred += 1
+                await asyncio.sleep(max(0.05, float(e.retry_after)))
+            except Exception:
+                break
+        self._on_translated(key, target_lang, translated)
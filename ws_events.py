@@ -0,0 +1,125 @@
+# ws_events.py
+"""
+Giải mã frame websocket của Mattermost theo 2 tầng (phần lớn traffic là typing /
+status_change / channel_viewed / reaction_added, không cần json.loads cả frame):
+
+  1. Lọc nhanh trên chuỗi thô: tên event và broadcast.channel_id được lấy bằng regex.
+     Post lồng trong data.post là chuỗi JSON đã escape (\\"channel_id\\"), nên key
+     "channel_id" không escape đầu tiên trong frame posted là của broadcast.
+     Không phải "posted" hoặc kênh không theo dõi → bỏ, không decode gì.
+  2. Frame còn lại: decode frame, kiểm tra lại event / kênh, rồi mới decode post.
+
+Backend JSON chọn bằng key WS_JSON_BACKEND trong config: "json" (mặc định) / "orjson" /
+"ujson". Backend không cài được → tự quay về "json".
+"""
+import json
+import re
+import threading
+
+from config_loader import WS_JSON_BACKEND
+
+_EVENT_RE = re.compile(r'"event"\s*:\s*"([^"\\]*)"')
+_CHANNEL_RE = re.compile(r'"channel_id"\s*:\s*"([^"\\]*)"')
+# "seq" của server là field cuối của frame (event, data, broadcast, seq)
+_SEQ_RE = re.compile(r'"seq"\s*:\s*(\d+)\s*}\s*$')
+
+
+def _orjson():
+    import orjson
+    return orjson.loads
+
+
+def _ujson():
+    import ujson
+    return ujson.loads
+
+
+BACKENDS = {
+    "json": lambda: json.loads,
+    "orjson": _orjson,
+    "ujson": _ujson,
+}
+
+_backend = {"name": "", "loads": json.loads}
+_stats_lock = threading.Lock()
+_stats = {"seen": 0, "skipped_event": 0, "skipped_channel": 0, "decoded": 0, "posts": 0}
+
+
+def set_backend(name: str) -> str:
+    """Đổi backend JSON. Trả về tên backend thực sự được dùng."""
+    try:
+        loads = BACKENDS[name]()
+    except Exception:
+        name, loads = "json", json.loads
+    _backend.update(name=name, loads=loads)
+    return name
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def peek_frame(message):
+    """(tên event, seq của server) đọc từ frame thô, không decode; thiếu field nào → None."""
+    m = _EVENT_RE.search(message)
+    event = m.group(1) if m else None
+    m = _SEQ_RE.search(message)
+    return event, (int(m.group(1)) if m else None)
+
+
+def decode_frame(message):
+    """Decode cả frame (dùng cho event hiếm như hello). Frame hỏng → None."""
+    try:
+        data = _backend["loads"](message)
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def decode_post(message, watch_channels, event=None):
+    """
+    Frame thô → dict post nếu là event "posted" ở kênh đang theo dõi, ngược lại None.
+    Frame hỏng cũng trả về None. `event`: tên event đã đọc bằng peek_frame (nếu có).
+    """
+    _count("seen")
+    if event is None:
+        m = _EVENT_RE.search(message)
+        event = m.group(1) if m else None
+    if event is not None and event != "posted":
+        _count("skipped_event")
+        return None
+    m = _CHANNEL_RE.search(message)
+    if m and m.group(1) and m.group(1) not in watch_channels:
+        _count("skipped_channel")
+        return None
+
+    loads = _backend["loads"]
+    try:
+        data = loads(message)
+    except Exception:
+        return None
+    _count("decoded")
+    if not isinstance(data, dict) or data.get("event") != "posted":
+        return None
+    body = data.get("data") or {}
+    channel_id = (data.get("broadcast") or {}).get("channel_id") or body.get("channel_id")
+    if channel_id and channel_id not in watch_channels:
+        return None
+    try:
+        post = loads(body["post"])
+    except Exception:
+        return None
+    _count("posts")
+    if not isinstance(post, dict) or post.get("channel_id") not in watch_channels:
+        return None
+    return post
+
+
+def decode_stats() -> dict:
+    """Số frame đã nhận / bị lọc nhanh / phải decode + backend JSON đang dùng."""
+    with _stats_lock:
+        return dict(_stats, backend=_backend["name"])
+
+
+set_backend(WS_JSON_BACKEND)